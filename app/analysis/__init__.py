@@ -0,0 +1,5 @@
+"""Game collections analysis module"""
+
+
+WORKERS = None # Worker processes (None for one per CPU)
+CHUNK_SIZE = 64 # Games sent to a worker at once
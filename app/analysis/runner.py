@@ -0,0 +1,286 @@
+"""Parallel game analysis runner.
+
+Replays game collections through ChessTable.move on a pool of worker
+processes and writes one JSON line per game. Games are read from binary
+archives (.cga, see app.storage.archive), PGN files (.pgn) or as compact move
+lists (.txt): one game per line, with the moves in coordinate notation
+separated by spaces (e.g. 'e2e4 e7e5 g1f3'). Lines starting with '#' are
+ignored.
+
+Workers only receive (game id, moves line, starting FEN) string tuples, so
+sending a chunk costs as much as the text itself. PGN moves are sent in SAN
+and decoded by the workers.
+
+usage: python -m app.analysis.runner SOURCE [--output FILE] [--depth N] [--workers N] [--chunk-size N]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from app.analysis import CHUNK_SIZE, WORKERS
+from app.engine.evaluation import evaluate_batch
+from app.engine.search import Engine
+from app.model.bitboard import QUEEN, coordinates
+from app.model.chess_table import ChessTable
+from app.model.moves import destination, move_name, origin, parse_move_name, promotion_kind
+from app.model.pgn import read_pgn
+from app.model.san import parse_san
+from app.storage.archive import EXTENSION, ArchiveReader
+
+
+COORDINATE_PATTERN = re.compile(r"^[a-h][1-8][a-h][1-8][nbrq]?$")
+
+
+_engine = None # One engine per worker process, reused by every search
+
+
+def read_games(source: str):
+    """
+        Reads the games of a file, a directory or the standard input.
+
+        params:
+            source: A games file, a directory (every .txt, .pgn and .cga file
+            in it, sorted by name) or '-' for the standard input (moves lists).
+
+        return: A generator of (game id, moves line, starting FEN) tuples, the
+        id being 'file:line' for moves lists and 'file:game number' for PGN
+        files and archives. The FEN is None for the standard starting
+        position.
+    """
+    if source == "-":
+        yield from _read_lines("stdin", sys.stdin)
+        return
+
+    if os.path.isdir(source):
+        paths = [
+            os.path.join(source, name) for name in sorted(os.listdir(source)) if name.endswith((".txt", ".pgn", EXTENSION))
+        ]
+    else:
+        paths = [source]
+
+    for path in paths:
+        if path.endswith(EXTENSION):
+            yield from _read_archive(path)
+            continue
+
+        with open(path) as file:
+            if path.endswith(".pgn"):
+                yield from _read_pgn(os.path.basename(path), file)
+            else:
+                yield from _read_lines(os.path.basename(path), file)
+
+
+def _read_lines(name: str, lines) -> tuple:
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield f"{name}:{number}", line, None
+
+
+def _read_pgn(name: str, file) -> tuple:
+    for number, game in enumerate(read_pgn(file, decode=False), 1):
+        yield f"{name}:{number}", " ".join(game.moves), game.tags.get("FEN")
+
+
+def _read_archive(path: str) -> tuple:
+    name = os.path.basename(path)
+
+    with ArchiveReader(path) as archive:
+        for number in range(len(archive)):
+            game = archive[number]
+            yield f"{name}:{number + 1}", " ".join(move_name(move) for move in game.moves), game.fen
+            game.moves.release()
+
+
+def analyse_game(game_id: str, line: str, depth: int = 0, fen: str = None) -> dict:
+    """
+        Replays a game and scores each of its positions.
+
+        params:
+            game_id: The game id.
+            line: The game moves in coordinate notation or SAN.
+            depth: The search depth of each position (0 for the static
+            evaluation).
+            fen: The starting position (None for the standard one).
+
+        return: A dict with the game id, the number of replayed plies, the
+        error stopping the replay (None if every move was legal), the score
+        of the position after each replayed move in the first player's point
+        of view (searched or static, both modes score the same positions)
+        and, when searching, the engine best move of the position before
+        each replayed move.
+    """
+    table = ChessTable()
+    error = None
+    plies = 0
+    rows = list() # Packed bitboards of each position for the static scores
+    scores = list()
+    best_moves = list()
+
+    moves = line.split()
+    try:
+        if fen is not None:
+            table.load_fen(fen)
+    except Exception as e:
+        error = f"FEN: {e}"
+        moves = list()
+
+    position = table.get_position()
+    result = None # The search of the current position
+
+    for name in moves:
+        player = position.turn
+
+        if depth > 0:
+            if result is None:
+                result = _search(table, depth)
+            best_moves.append(move_name(result.move) if result.move else None)
+
+        try:
+            _from, to, promotion = parse_move(table, name)
+            table.move(coordinates(_from), coordinates(to), player, promotion)
+        except Exception as e:
+            error = f"ply {plies + 1} ({name}): {e}"
+            if depth > 0: # The failed move position was searched
+                best_moves.pop()
+            break
+
+        plies += 1
+        if depth > 0: # Scores the position after the move, its best move is the next ply one
+            result = _search(table, depth)
+            scores.append(result.score if position.turn == 0 else -result.score)
+        else:
+            rows.append([bitboard for bitboards in position.bitboards for bitboard in bitboards])
+
+    if depth == 0 and rows:
+        scores = evaluate_batch(np.array(rows, dtype=np.uint64)).tolist()
+
+    analysis = {"game": game_id, "plies": plies, "error": error, "scores": scores}
+    if depth > 0:
+        analysis["best_moves"] = best_moves
+
+    return analysis
+
+
+def parse_move(table: ChessTable, name: str) -> tuple:
+    """
+        Parses a move in coordinate notation or SAN.
+
+        params:
+            table: The ChessTable object the move is played on.
+            name: The move name.
+
+        return: A tuple with the origin square, the destination square and
+        the promotion piece kind (QUEEN if the move doesn't promote).
+    """
+    if COORDINATE_PATTERN.match(name):
+        return parse_move_name(name)
+
+    move = parse_san(table.get_position(), name)
+    promotion = promotion_kind(move)
+
+    return origin(move), destination(move), promotion if promotion is not None else QUEEN
+
+
+def _search(table: ChessTable, depth: int):
+    global _engine
+
+    if _engine is None:
+        _engine = Engine()
+
+    return _engine.search(table, max_depth=depth)
+
+
+def analyse_chunk(games: list, depth: int = 0) -> list:
+    """
+        Analyses a chunk of games (the work unit of a worker process).
+
+        params:
+            games: A list of (game id, moves line, starting FEN) tuples.
+            depth: The search depth of each position (0 for the static
+            evaluation).
+
+        return: The analysis of each game (see analyse_game).
+    """
+    return [analyse_game(game_id, line, depth, fen) for game_id, line, fen in games]
+
+
+def run(games, output, depth: int = 0, workers: int = WORKERS, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+        Analyses a stream of games in parallel, writing one JSON line per
+        game in the input order.
+
+        Only a few chunks per worker are in flight at once, so streams of any
+        size run in bounded memory.
+
+        params:
+            games: An iterable of (game id, moves line, starting FEN) tuples.
+            output: A writable text file.
+            depth: The search depth of each position (0 for the static
+            evaluation).
+            workers: The number of worker processes (None for one per CPU,
+            1 to run in this process).
+            chunk_size: The number of games sent to a worker at once.
+
+        return: The number of analysed games.
+    """
+    games = iter(games)
+    chunks = iter(lambda: list(islice(games, chunk_size)), [])
+    count = 0
+
+    if workers == 1:
+        for chunk in chunks:
+            count += _write(output, analyse_chunk(chunk, depth))
+        return count
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window = 2 * (workers or os.cpu_count() or 1)
+        pending = deque()
+
+        for chunk in chunks:
+            pending.append(executor.submit(analyse_chunk, chunk, depth))
+            if len(pending) >= window:
+                count += _write(output, pending.popleft().result())
+
+        while pending:
+            count += _write(output, pending.popleft().result())
+
+    return count
+
+
+def _write(output, analyses: list) -> int:
+    output.write("".join(json.dumps(analysis) + "\n" for analysis in analyses))
+
+    return len(analyses)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="games file, directory of .txt, .pgn and .cga files or - for the standard input")
+    parser.add_argument("--output", default="-", help="JSON lines output file (- for the standard output)")
+    parser.add_argument("--depth", type=int, default=0, help="search depth of each position (0 for static scores)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="worker processes (defaults to one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="games sent to a worker at once")
+    args = parser.parse_args(argv)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        count = run(read_games(args.source), output, args.depth, args.workers, args.chunk_size)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"{count} games analysed", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,8 @@
 """Game controller module"""
 
 
-MOVE_DELAY = 500
\ No newline at end of file
+POLL_INTERVAL = 20 # Milliseconds between window updates (engine results, clocks)
+UNDO_KEY = ord("u") # Takes back the last move (and the engine answer)
+REDO_KEY = ord("r")
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 5555
@@ -3,43 +3,158 @@
 import cv2
 from numpy import ndarray
 
-from app.controller import MOVE_DELAY
+from app.controller import POLL_INTERVAL, REDO_KEY, UNDO_KEY
+from app.engine import SEARCH_TIME
+from app.engine.book import OpeningBook
+from app.engine.clock import Clock, format_time
+from app.engine.search import MATE, MATE_BOUND, Engine
+from app.engine.tablebase import Tablebases
+from app.engine.worker import SearchWorker
 from app.model.chess_table import ChessTable
+from app.model.moves import move_name
 from app.model.pieces.piece import Piece
-from app.view.board_view import draw_board, draw_moves, draw_warning, get_square
+from app.view.board_view import BoardRenderer
+from app.view.sprites import get_atlas
+
+
+PV_LENGTH = 6 # Moves of the principal variation shown in the window title
+PLAYER_NAMES = ("White", "Black")
 
 
 class Game:
-    def __init__(self):
+    def __init__(
+            self,
+            engine_players: tuple = (),
+            think_time: float = SEARCH_TIME,
+            book: str = None,
+            tablebases: str = None,
+            scale: int = 1,
+            time_control: tuple = None,
+            ponder: bool = False
+        ):
+        """
+            Chess game window.
+
+            The engine searches on a background thread while the window keeps
+            drawing and reading the mouse. Its best move so far is highlighted
+            and its principal variation shown in the window title.
+
+            params:
+                engine_players: The players (0 or 1) moved by the engine, empty
+                for two human players.
+                think_time: Seconds the engine thinks on each move (without a
+                time control).
+                book: The opening book file the engine plays from before
+                thinking (None for no book).
+                tablebases: The endgame tablebases directory the engine plays
+                from (None for no tablebases).
+                scale: The board image scale (the window can still be resized).
+                time_control: The (base seconds, increment seconds, moves to
+                go or None) of both players' clocks, the engine budgets its
+                moves from its clock (None for no clocks).
+                ponder: If it's True the engine analyses the human's turns,
+                showing its best move, and fills its memory for its own move.
+        """
+        self.__engine_players = tuple(engine_players)
+        self.__think_time = think_time
+        self.__time_control = time_control
+        self.__ponder = ponder
+        self.__worker = None
+        if self.__engine_players or ponder:
+            self.__worker = SearchWorker(Engine(
+                book=OpeningBook(book) if book is not None else None,
+                tablebases=Tablebases(tablebases) if tablebases is not None else None
+            ))
+        get_atlas() # Sprites are loaded before the first frame
+        self.__renderer = BoardRenderer(scale)
+        self.__title = None
         self.new_game()
-    
+
     def new_game(self) -> None:
         """Start a new game."""
+        if self.__worker is not None:
+            self.__worker.new_game()
         self.__table = ChessTable()
         self.__turn = 0
         self.__selected = None
         self.__under_xeque = False
-    
-    def show(self, wait: int = 0) -> None:
+        self.__game_over = False
+        self.__clock = Clock(*self.__time_control) if self.__time_control is not None else None
+        if self.__clock is not None:
+            self.__clock.start(0)
+
+    def show(self) -> None:
         """
-            Shows a window filled with the game frame.
+            Shows a window filled with the game frame, until a key other than
+            undo and redo is pressed or the window is closed.
         """
         self.__window = cv2.namedWindow("Chess", cv2.WINDOW_KEEPRATIO)
         cv2.setMouseCallback("Chess", self.__callback)
         cv2.imshow("Chess", self.__draw_frame())
-        cv2.waitKey(wait)
-        
+
+        try:
+            while True:
+                self.__update()
+                if self.__render(): # Nothing to show if no square changed
+                    cv2.imshow("Chess", self.__renderer.get_frame())
+                self.__update_title()
+
+                key = cv2.waitKey(POLL_INTERVAL) # Mouse events are handled in here
+                if key == UNDO_KEY:
+                    self.undo()
+                elif key == REDO_KEY:
+                    self.redo()
+                elif key != -1 or cv2.getWindowProperty("Chess", cv2.WND_PROP_VISIBLE) < 1:
+                    break
+        finally:
+            if self.__worker is not None:
+                self.__worker.stop()
+
+    def undo(self) -> None:
+        """Takes back the last move, and the engine move before it when playing the engine."""
+        if self.__table.undo() is None:
+            return
+
+        self.__turn -= 1
+        self.__game_over = False
+        if self.__is_engine_turn() and len(self.__engine_players) < 2 and self.__table.undo() is not None:
+            self.__turn -= 1
+
+        self.__selected = None
+        self.__under_xeque = self.__table.is_under_xeque(self.__turn % 2)
+        if self.__clock is not None: # Taken back moves don't give their time back
+            self.__clock.pause()
+            self.__clock.start(self.__turn % 2)
+
+    def redo(self) -> None:
+        """Plays again the last moves taken back by undo."""
+        if self.__table.redo() is None:
+            return
+
+        self.__selected = None
+        self.__end_turn()
+        if self.__is_engine_turn() and self.__table.redo() is not None:
+            self.__end_turn()
+
     def __callback(self, *args) -> None:
         action = args[0]
-        loc = list(reversed(args[1: 3]))
-        loc = get_square(loc)
+        if action not in (1, 2): # Mouse moves and the other events change nothing
+            return
+
+        loc = self.__renderer.get_square((args[2], args[1]), self.__turn % 2 == 1)
 
-        if action == 1:
+        if action == 1 and self.__game_over:
+            self.new_game()
+
+        elif action == 1 and self.__is_engine_turn():
+            return
+
+        elif action == 1:
             if isinstance(self.__selected, Piece):
                 self.__move(loc)
                 self.__selected = None
             else:
-                selected = self.__table.get_piece_by_loc(loc, self.__turn % 2 == 1)
+                selected = self.__table.get_piece_by_loc(loc)
                 if selected and selected.get_player() == self.__turn % 2:
                     self.__selected = selected
                 else:
@@ -48,29 +163,124 @@ class Game:
         elif action == 2:
             self.__selected = None
 
-        else:
-            return
-        
-        self.show()
-
     def __draw_frame(self) -> ndarray:
-        player = self.__turn % 2
+        self.__render()
+
+        return self.__renderer.get_frame()
 
-        board = draw_board(self.__table, player == 1)
-        if self.__selected:
-            board = draw_moves(self.__table, board, self.__selected, player == 1)
-        if self.__under_xeque:
-            board = draw_warning(self.__table, board, self.__turn % 2)
+    def __render(self) -> list:
+        player = self.__turn % 2
+        warning = player if self.__under_xeque else None
 
-        return board
+        return self.__renderer.render(self.__table, self.__selected, warning, player == 1, self.__hint())
 
     def __move(self, loc) -> None:
         try:
             self.__table.move(self.__selected.get_coordinates(), loc, self.__turn % 2)
-            self.show(MOVE_DELAY)
-            self.__turn += 1
-
-            self.__under_xeque = self.__table.is_under_xeque(self.__turn % 2)
+            self.__end_turn()
 
         except Exception as e:
-            print(e)
\ No newline at end of file
+            print(e)
+
+    def __is_engine_turn(self) -> bool:
+        return not self.__game_over and self.__turn % 2 in self.__engine_players
+
+    def __update(self) -> None:
+        """Checks the clocks and starts, follows or plays the background searches."""
+        if self.__clock is not None and not self.__game_over and self.__clock.flagged(self.__turn % 2):
+            print(f"Time out! {PLAYER_NAMES[1 - self.__turn % 2]} wins.")
+            self.__set_game_over()
+
+        if self.__worker is None:
+            return
+
+        engine_turn = self.__is_engine_turn()
+        if self.__game_over or not (engine_turn or self.__ponder):
+            self.__worker.stop()
+            return
+
+        key = (self.__turn, self.__table.position_hash(), engine_turn)
+        if self.__worker.get_key() != key: # A move, an undo or a new game changed the position
+            if engine_turn:
+                time_limit = self.__think_time
+                if self.__clock is not None:
+                    time_limit = self.__clock.budget(self.__turn % 2)
+            else:
+                time_limit = None # Pondering runs until the human moves
+            self.__worker.start(self.__table, time_limit, key=key)
+
+        elif engine_turn and self.__worker.is_done():
+            self.__table.play_move(self.__worker.get_result().move)
+            self.__end_turn()
+
+    def __hint(self) -> int:
+        """Returns the best move of the current position search so far (None if there isn't one)."""
+        if self.__worker is None or self.__game_over or self.__worker.get_key() is None:
+            return None
+
+        turn, key, _ = self.__worker.get_key()
+        result = self.__worker.get_result()
+        if result is None or turn != self.__turn or key != self.__table.position_hash():
+            return None
+
+        return result.move or None
+
+    def __update_title(self) -> None:
+        parts = ["Chess"]
+
+        if self.__clock is not None:
+            parts.append("  ".join(
+                f"{PLAYER_NAMES[i]} {format_time(self.__clock.time_left(i))}" for i in range(2)
+            ))
+
+        result = self.__worker.get_result() if self.__hint() is not None else None
+        if result is not None and result.depth:
+            score = result.score if self.__turn % 2 == 0 else -result.score
+            pv = " ".join(move_name(move) for move in result.pv[:PV_LENGTH])
+            parts.append(f"depth {result.depth} {_score_text(score)} {pv}")
+
+        title = " - ".join(parts)
+        if title != self.__title:
+            cv2.setWindowTitle("Chess", title)
+            self.__title = title
+
+    def __end_turn(self) -> None:
+        self.__turn += 1
+        if self.__clock is not None:
+            self.__clock.start(self.__turn % 2)
+
+        self.__under_xeque = self.__table.is_under_xeque(self.__turn % 2)
+        self.__check_game_over()
+
+    def __set_game_over(self) -> None:
+        self.__game_over = True
+        if self.__clock is not None:
+            self.__clock.pause()
+
+    def __check_game_over(self) -> None:
+        player = self.__turn % 2
+
+        if self.__table.is_xeque_mate(player):
+            print(f"Xeque mate! {PLAYER_NAMES[1 - player]} wins.")
+            self.__set_game_over()
+
+        elif self.__table.is_stalemate(player):
+            print("Stalemate! The game is a draw.")
+            self.__set_game_over()
+
+        elif self.__table.is_threefold_repetition():
+            print("Threefold repetition! The game is a draw.")
+            self.__set_game_over()
+
+        elif self.__table.is_fifty_moves():
+            print("Fifty moves without captures or pawn moves! The game is a draw.")
+            self.__set_game_over()
+
+
+def _score_text(score: int) -> str:
+    """Formats a score in the first player's point of view, in pawns or moves to mate."""
+    if abs(score) >= MATE_BOUND:
+        moves = (MATE - abs(score) + 1) // 2
+        return f"#{moves}" if score > 0 else f"#-{moves}"
+
+    return f"{score / 100:+.2f}"
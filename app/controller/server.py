@@ -0,0 +1,229 @@
+"""Headless game server.
+
+Hosts any number of games over a line protocol on a local TCP socket. Every
+request is a line and gets a reply line, 'ok ...' or 'error MESSAGE':
+
+    new [FEN]           ok GAME
+    move GAME MOVE      ok STATUS (MOVE in coordinate notation or SAN, STATUS
+                        is play, check, checkmate, stalemate or draw)
+    moves GAME          ok MOVE... (the legal moves)
+    fen GAME            ok FEN
+    go GAME [SECONDS]   ok MOVE SCORE (the engine move, it isn't played)
+    close GAME          ok
+    quit                (closes the connection)
+
+Games aren't tied to a connection. Move validation and check detection run
+in a thread pool and searches in a process pool, so the event loop only
+reads, routes and writes lines.
+
+usage: python -m app.controller.server [--host HOST] [--port PORT] [--workers N]
+"""
+import argparse
+import asyncio
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from inspect import signature
+
+from app.analysis.runner import parse_move
+from app.controller import SERVER_HOST, SERVER_PORT
+from app.engine import SEARCH_TIME
+from app.engine.search import Engine
+from app.model.bitboard import coordinates
+from app.model.chess_table import ChessTable
+from app.model.moves import move_name
+
+
+_engine = None # One engine per worker process, reused by every search
+
+
+class GameServer:
+    def __init__(self, workers: int = None):
+        """
+            Headless games host.
+
+            params:
+                workers: The number of search processes (None for one per CPU).
+        """
+        self.__games = dict() # Game id: (ChessTable, asyncio.Lock)
+        self.__next_id = 1
+        self.__threads = ThreadPoolExecutor()
+        self.__processes = ProcessPoolExecutor(workers)
+        self.__commands = {
+            "new": self.__new,
+            "move": self.__move,
+            "moves": self.__moves,
+            "fen": self.__fen,
+            "go": self.__go,
+            "close": self.__close
+        }
+
+    def __len__(self) -> int:
+        return len(self.__games)
+
+    async def serve(self, host: str = SERVER_HOST, port: int = SERVER_PORT) -> None:
+        """Accepts connections until the task is cancelled."""
+        server = await asyncio.start_server(self.__connection, host, port)
+
+        async with server:
+            await server.serve_forever()
+
+    async def request(self, line: str) -> str:
+        """
+            Runs a protocol request.
+
+            params:
+                line: The request line.
+
+            return: The reply line (without the line break).
+        """
+        words = line.split()
+        if not words:
+            return "error empty request"
+
+        command = self.__commands.get(words[0].lower())
+        if command is None:
+            return f"error unknown command: {words[0]}"
+
+        try:
+            signature(command).bind(*words[1:])
+        except TypeError:
+            return f"error wrong arguments for {words[0]}"
+
+        try:
+            return "ok " + await command(*words[1:])
+        except Exception as e:
+            return f"error {e}"
+
+    def close(self) -> None:
+        """Shuts the executors down."""
+        self.__threads.shutdown()
+        self.__processes.shutdown()
+
+    async def __connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line or line.strip().lower() == b"quit":
+                    break
+
+                writer.write((await self.request(line.decode(errors="replace")) + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def __new(self, *fen: str) -> str:
+        table = ChessTable()
+        if fen:
+            table.load_fen(" ".join(fen))
+
+        game_id = str(self.__next_id)
+        self.__next_id += 1
+        self.__games[game_id] = (table, asyncio.Lock())
+
+        return game_id
+
+    async def __move(self, game_id: str, name: str) -> str:
+        table, lock = self.__game(game_id)
+
+        async with lock:
+            return await asyncio.get_running_loop().run_in_executor(self.__threads, _play, table, name)
+
+    async def __moves(self, game_id: str) -> str:
+        table, lock = self.__game(game_id)
+
+        async with lock:
+            moves = await asyncio.get_running_loop().run_in_executor(
+                self.__threads, table.legal_moves, table.get_position().turn
+            )
+
+        return " ".join(move_name(move) for move in moves)
+
+    async def __fen(self, game_id: str) -> str:
+        table, lock = self.__game(game_id)
+
+        async with lock:
+            return table.get_fen()
+
+    async def __go(self, game_id: str, seconds: str = None) -> str:
+        table, lock = self.__game(game_id)
+        seconds = SEARCH_TIME if seconds is None else float(seconds)
+
+        async with lock:
+            fen = table.get_fen()
+
+        move, score = await asyncio.get_running_loop().run_in_executor(self.__processes, _search, fen, seconds)
+        if move is None:
+            raise ValueError("the game is over")
+
+        return f"{move} {score}"
+
+    async def __close(self, game_id: str) -> str:
+        self.__game(game_id)
+        del self.__games[game_id]
+
+        return game_id
+
+    def __game(self, game_id: str) -> tuple:
+        if game_id not in self.__games:
+            raise ValueError(f"unknown game: {game_id}")
+
+        return self.__games[game_id]
+
+
+def _play(table: ChessTable, name: str) -> str:
+    """Plays a move and returns the status of the player to move next."""
+    player = table.get_position().turn
+    _from, to, promotion = parse_move(table, name)
+    table.move(coordinates(_from), coordinates(to), player, promotion)
+
+    player = 1 - player
+    if table.is_xeque_mate(player):
+        return "checkmate"
+    if table.is_stalemate(player):
+        return "stalemate"
+    if table.is_draw():
+        return "draw"
+    if table.is_under_xeque(player):
+        return "check"
+
+    return "play"
+
+
+def _search(fen: str, seconds: float) -> tuple:
+    """Searches a position in a worker process (the moves before it are unknown)."""
+    global _engine
+
+    if _engine is None:
+        _engine = Engine()
+
+    table = ChessTable()
+    table.load_fen(fen)
+    result = _engine.search(table, time_limit=seconds)
+
+    return (move_name(result.move) if result.move else None), result.score
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=SERVER_HOST, help="listening address")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="listening port")
+    parser.add_argument("--workers", type=int, default=None, help="search processes (defaults to one per CPU)")
+    args = parser.parse_args(argv)
+
+    server = GameServer(args.workers)
+    print(f"Serving games on {args.host}:{args.port}", file=sys.stderr)
+
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""Chess engine module"""
+
+
+SEARCH_TIME = 1.0 # Seconds the engine thinks on each move in a game
+TABLE_BITS = 18 # The transposition table holds 2 ** TABLE_BITS entries
@@ -0,0 +1,187 @@
+"""Opening book module.
+
+File layout (little endian): magic, entries count (uint64), then one entry
+per (position, move) pair sorted by position key: key (uint64), packed move
+(uint16) and weight (uint16).
+
+The book is read through a memory map and probed with a binary search, so
+opening it costs nothing whatever its size.
+
+usage: python -m app.engine.book build ARCHIVE BOOK [--max-ply N] [--min-count N] [--min-share F]
+       python -m app.engine.book probe BOOK FEN
+"""
+import argparse
+import mmap
+import random
+import struct
+import sys
+from collections import Counter
+
+from app.model.chess_table import ChessTable
+from app.model.fen import START_FEN, parse_fen
+from app.model.moves import move_name
+from app.storage.archive import ArchiveReader
+
+
+MAGIC = b"CHESSOB1"
+HEADER = struct.Struct("<8sQ")
+ENTRY = struct.Struct("<QHH")
+
+MAX_PLY = 20 # Deepest ply of the book moves
+MIN_COUNT = 3 # Games that must have played a move to put it in the book
+MIN_SHARE = 0.05 # Share of a position's games that must have played a move
+
+
+class OpeningBook:
+    def __init__(self, path: str):
+        """
+            Reads an opening book through a read only memory map.
+
+            params:
+                path: The book file path.
+        """
+        with open(path, "rb") as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.__count = HEADER.unpack_from(self.__map, 0)
+        if magic != MAGIC:
+            self.__map.close()
+            raise ValueError(f"{path} isn't an opening book.")
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def entries(self, key: int) -> list:
+        """
+            Finds the book moves of a position.
+
+            params:
+                key: The position key (see ChessTable.position_hash).
+
+            return: A list of (packed move, weight) tuples.
+        """
+        low, high = 0, self.__count
+        while low < high: # First entry with a key not lower than the given one
+            middle = (low + high) >> 1
+            if ENTRY.unpack_from(self.__map, HEADER.size + middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        entries = list()
+        for i in range(low, self.__count):
+            entry_key, move, weight = ENTRY.unpack_from(self.__map, HEADER.size + i * ENTRY.size)
+            if entry_key != key:
+                break
+            entries.append((move, weight))
+
+        return entries
+
+    def choose(self, key: int, legal_moves: list = None, rng: random.Random = None) -> int:
+        """
+            Picks a book move at random, in proportion to the weights.
+
+            params:
+                key: The position key (see ChessTable.position_hash).
+                legal_moves: If it's given only these moves are picked (it
+                guards against keys collisions).
+                rng: The random generator (the random module if it's None).
+
+            return: The packed move or None if the position isn't in the book.
+        """
+        entries = [
+            (move, weight) for move, weight in self.entries(key)
+            if weight and (legal_moves is None or move in legal_moves)
+        ]
+        if not entries:
+            return None
+
+        moves, weights = zip(*entries)
+
+        return (rng or random).choices(moves, weights)[0]
+
+    def close(self) -> None:
+        """Unmaps the file."""
+        self.__map.close()
+
+
+def build_book(
+        archive_path: str,
+        book_path: str,
+        max_ply: int = MAX_PLY,
+        min_count: int = MIN_COUNT,
+        min_share: float = MIN_SHARE
+    ) -> int:
+    """
+        Builds an opening book from the games of an archive. The weight of a
+        move is the number of games playing it.
+
+        params:
+            archive_path: The game archive path (see app.storage.archive).
+            book_path: The book file path.
+            max_ply: Only moves played before this ply are counted.
+            min_count: Moves played in fewer games are left out.
+            min_share: Moves played in a smaller share of the games reaching
+            the position are left out.
+
+        return: The number of book entries.
+    """
+    moves = Counter()
+    positions = Counter()
+
+    with ArchiveReader(archive_path) as archive:
+        for number in range(len(archive)):
+            game = archive[number]
+            position = parse_fen(game.fen or START_FEN)
+
+            for move in game.moves[:max_ply]:
+                moves[position.key, move] += 1
+                positions[position.key] += 1
+                position.make_move(move)
+
+            game.moves.release()
+
+    entries = sorted(
+        (key, move, min(count, 0xFFFF)) for (key, move), count in moves.items()
+        if count >= min_count and count >= min_share * positions[key]
+    )
+
+    with open(book_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(entries)))
+        file.write(b"".join(ENTRY.pack(*entry) for entry in entries))
+
+    return len(entries)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Builds or probes an opening book")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="build a book from a game archive")
+    build.add_argument("archive", help="game archive file")
+    build.add_argument("book", help="book file")
+    build.add_argument("--max-ply", type=int, default=MAX_PLY, help="deepest ply of the book moves")
+    build.add_argument("--min-count", type=int, default=MIN_COUNT, help="games that must have played a move")
+    build.add_argument("--min-share", type=float, default=MIN_SHARE, help="share of games that must have played a move")
+
+    probe = commands.add_parser("probe", help="show the book moves of a position")
+    probe.add_argument("book", help="book file")
+    probe.add_argument("fen", help="position FEN string")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count = build_book(args.archive, args.book, args.max_ply, args.min_count, args.min_share)
+        print(f"{count} book entries", file=sys.stderr)
+        return 0
+
+    table = ChessTable()
+    table.load_fen(args.fen)
+    for move, weight in sorted(OpeningBook(args.book).entries(table.position_hash()), key=lambda entry: -entry[1]):
+        print(f"{move_name(move):<6} {weight:>6}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Game clock and time management module.
+
+A Clock keeps both players' remaining time under a time control: a base
+time, an increment added after each move and, optionally, a number of moves
+to play before the base time is added again (classical controls like 40
+moves in 90 minutes). The engine budget of a move spreads the remaining time
+over the moves still to play and spends most of the increment.
+"""
+import time
+
+
+MOVES_HORIZON = 30 # Moves the remaining time is spread over without a moves to go count
+INCREMENT_SHARE = 0.75 # Share of the increment spent on each move
+MAX_SHARE = 0.5 # A move never gets more than this share of the remaining time
+TIME_MARGIN = 0.05 # Seconds kept back for the move overhead
+
+
+class Clock:
+    def __init__(self, base: float, increment: float = 0.0, moves_to_go: int = None):
+        """
+            Two players chess clock.
+
+            params:
+                base: Seconds of each player at the start (and at each new
+                period when moves_to_go is given).
+                increment: Seconds added after each move.
+                moves_to_go: Moves of each period (None for a single period,
+                the whole game).
+        """
+        self.base = base
+        self.increment = increment
+        self.moves_to_go = moves_to_go
+        self.__remaining = [float(base), float(base)]
+        self.__moves_left = [moves_to_go, moves_to_go]
+        self.__running = None # Player whose time is running
+        self.__started = 0.0
+
+    def start(self, player: int) -> None:
+        """Starts the time of a player (stopping the other one first)."""
+        if self.__running is not None:
+            self.stop()
+
+        self.__running = player
+        self.__started = time.perf_counter()
+
+    def stop(self) -> float:
+        """
+            Stops the running time at the end of a move, adding the increment
+            and the next period base time.
+
+            return: The seconds the move took (0 if no time was running).
+        """
+        player = self.__running
+        if player is None:
+            return 0.0
+
+        elapsed = time.perf_counter() - self.__started
+        self.__running = None
+        self.__remaining[player] -= elapsed
+        if self.__remaining[player] <= 0: # Flag fallen, no increment saves it
+            return elapsed
+
+        self.__remaining[player] += self.increment
+        if self.moves_to_go is not None:
+            self.__moves_left[player] -= 1
+            if self.__moves_left[player] == 0:
+                self.__moves_left[player] = self.moves_to_go
+                self.__remaining[player] += self.base
+
+        return elapsed
+
+    def pause(self) -> None:
+        """Stops the running time without ending the move (no increment)."""
+        if self.__running is not None:
+            self.__remaining[self.__running] -= time.perf_counter() - self.__started
+            self.__running = None
+
+    def time_left(self, player: int) -> float:
+        """Returns the seconds left to a player, counting the running move."""
+        if player == self.__running:
+            return self.__remaining[player] - (time.perf_counter() - self.__started)
+
+        return self.__remaining[player]
+
+    def flagged(self, player: int) -> bool:
+        """Checks if a player ran out of time."""
+        return self.time_left(player) <= 0
+
+    def budget(self, player: int) -> float:
+        """
+            Computes the seconds the engine thinks on a move of a player.
+
+            params:
+                player: An int number indicating the player (0 or 1).
+
+            return: The search time limit (the search stops its iterations
+            once half of it is gone, so it's usually not fully spent).
+        """
+        left = self.time_left(player) - TIME_MARGIN
+        moves = self.__moves_left[player] or MOVES_HORIZON
+
+        budget = left / moves + self.increment * INCREMENT_SHARE
+
+        return max(min(budget, left * MAX_SHARE), 0.01)
+
+
+def format_time(seconds: float) -> str:
+    """Formats seconds as m:ss (tenths under ten seconds)."""
+    seconds = max(seconds, 0.0)
+    if seconds < 10:
+        return f"0:{seconds:04.1f}"
+
+    minutes, seconds = divmod(int(seconds), 60)
+
+    return f"{minutes}:{seconds:02d}"
@@ -0,0 +1,376 @@
+"""Alpha-beta search module
+"""
+import time
+from typing import Callable, NamedTuple
+
+from app.engine import TABLE_BITS
+from app.engine.book import OpeningBook
+from app.engine.evaluation import evaluate
+from app.engine.tablebase import Tablebases
+from app.engine.transposition import EXACT, LOWER, UPPER, TranspositionTable
+from app.model.bitboard import PAWN, QUEEN
+from app.model.chess_table import ChessTable
+from app.model.movegen import legal_moves
+from app.model.moves import EN_PASSANT, PROMOTION, promotion_flag
+from app.model.position import Position
+
+
+MAX_PLY = 64
+MATE = 30000
+MATE_BOUND = MATE - MAX_PLY # Scores beyond it are mates in some plies
+INFINITY = MATE + 1
+CHECK_INTERVAL = 2047 # The budgets are checked every CHECK_INTERVAL + 1 nodes
+
+# Move ordering ranks, the score fills the bits above the packed move
+_TT_MOVE = 1 << 24
+_CAPTURE = 1 << 22
+_KILLER = 1 << 21
+_HISTORY_LIMIT = 1 << 20
+
+_QUEEN_PROMOTION = promotion_flag(QUEEN)
+
+
+class SearchResult(NamedTuple):
+    move: int # The best packed move (0 if there is no legal move)
+    score: int # Centipawns in the point of view of the player to move
+    depth: int # The last fully searched depth
+    nodes: int
+    elapsed: float # Seconds
+    pv: list # The principal variation (packed moves)
+
+    @property
+    def nps(self) -> float:
+        """Searched nodes per second."""
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class Engine:
+    def __init__(self, table_bits: int = TABLE_BITS, book: OpeningBook = None, tablebases: Tablebases = None):
+        """
+            Iterative deepening alpha-beta (negamax) engine.
+
+            Moves are ordered by the transposition table move, captures (most
+            valuable victim, least valuable attacker), killer moves and the
+            history heuristic. The leaves are extended with a quiescence search
+            over captures. Every table is allocated once here and reused by the
+            following searches.
+
+            params:
+                table_bits: The log2 of the transposition table entries.
+                book: An opening book probed before searching (None for no
+                book).
+                tablebases: Endgame tablebases playing the covered positions
+                perfectly instead of searching (None for no tablebases).
+        """
+        self.__book = book
+        self.__tablebases = tablebases
+        self.__table = TranspositionTable(table_bits)
+        self.__killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.__history = [[0] * 4096 for _ in range(2)] # [player][origin | destination << 6]
+        self.__path = list()
+        self.__nodes = 0
+        self.__node_limit = None
+        self.__deadline = None
+        self.__stopped = False
+        self.__root_move = 0
+
+    def new_game(self) -> None:
+        """Forgets everything learned in previous searches."""
+        self.__table.clear()
+        self.__history = [[0] * 4096 for _ in range(2)]
+
+    def stop(self) -> None:
+        """Stops the running search, which returns its best move so far."""
+        self.__stopped = True
+
+    def search(
+            self,
+            table: ChessTable,
+            max_depth: int = MAX_PLY - 1,
+            time_limit: float = None,
+            node_limit: int = None,
+            callback: Callable = None
+        ) -> SearchResult:
+        """
+            Searches the best move of the player to move, unless the opening
+            book has a move for the position or the tablebases cover it.
+
+            params:
+                table: The ChessTable object (it's restored when the search ends).
+                max_depth: The deepest iteration in plies.
+                time_limit: The time budget in seconds (None for no limit).
+                node_limit: The nodes budget (None for no limit).
+                callback: A function called with the SearchResult of each
+                completed iteration.
+
+            return: A SearchResult object.
+        """
+        position = table.get_position()
+        start = time.perf_counter()
+
+        self.__nodes = 0
+        self.__node_limit = node_limit
+        self.__deadline = None if time_limit is None else start + time_limit
+        self.__stopped = False
+        # Reaching a game position again is a repetition too (only positions since the last capture or pawn move can repeat)
+        self.__path = table.get_hashes()[-1 - position.halfmove: -1]
+        self.__table.new_search()
+        for killers in self.__killers:
+            killers[0] = killers[1] = 0
+        for history in self.__history:
+            for i in range(4096):
+                history[i] >>= 1
+
+        moves = legal_moves(position)
+        if not moves:
+            in_xeque = position.is_square_attacked(position.king_square(position.turn), 1 - position.turn)
+            return SearchResult(0, -MATE if in_xeque else 0, 0, 0, 0.0, list())
+
+        if self.__book is not None:
+            move = self.__book.choose(position.key, moves)
+            if move is not None:
+                return SearchResult(move, 0, 0, 0, time.perf_counter() - start, [move])
+
+        if self.__tablebases is not None and self.__tablebases.covers(position):
+            probe = self.__tablebases.probe(position)
+            move = self.__tablebases.best_move(position)
+            if probe is not None and move is not None:
+                score = probe.wdl * (MATE - probe.dtm) if probe.wdl else 0
+                return SearchResult(move, score, 0, 0, time.perf_counter() - start, [move])
+
+        result = SearchResult(moves[0], 0, 0, 0, 0.0, [moves[0]])
+
+        for depth in range(1, max_depth + 1):
+            self.__root_move = 0
+            score = self.__negamax(position, depth, -INFINITY, INFINITY, 0)
+
+            if self.__stopped: # Moves fully searched in the last iteration are still good
+                if self.__root_move and self.__root_move != result.move:
+                    result = result._replace(move=self.__root_move, pv=[self.__root_move])
+                break
+
+            elapsed = time.perf_counter() - start
+            pv = self.__principal_variation(position, depth)
+            result = SearchResult(self.__root_move, score, depth, self.__nodes, elapsed, pv)
+            if callback is not None:
+                callback(result)
+
+            if abs(score) >= MATE_BOUND and MATE - abs(score) <= depth:
+                break
+            if time_limit is not None and elapsed > time_limit / 2: # Next iteration wouldn't end
+                break
+
+        return result._replace(nodes=self.__nodes, elapsed=time.perf_counter() - start)
+
+    def __check_limits(self) -> None:
+        if self.__node_limit is not None and self.__nodes >= self.__node_limit:
+            self.__stopped = True
+        elif self.__deadline is not None and time.perf_counter() >= self.__deadline:
+            self.__stopped = True
+
+    def __negamax(self, position: Position, depth: int, alpha: int, beta: int, ply: int) -> int:
+        if not self.__nodes & CHECK_INTERVAL:
+            self.__check_limits()
+        if self.__stopped:
+            return 0
+        self.__nodes += 1
+
+        key = position.key
+        if ply and key in self.__path: # Repeating the line is a draw
+            return 0
+
+        player = position.turn
+        in_xeque = position.is_square_attacked(position.king_square(player), 1 - player)
+        if in_xeque:
+            depth += 1
+
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self.__quiescence(position, alpha, beta, ply)
+
+        tt_move = 0
+        entry = self.__table.probe(key)
+        if entry is not None:
+            tt_move, tt_depth, bound, score = entry
+            if ply and tt_depth >= depth:
+                score = _from_table(score, ply)
+                if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                    return score
+
+        moves = legal_moves(position)
+        if not moves:
+            return -MATE + ply if in_xeque else 0
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = 0
+        mailbox = position.mailbox
+        self.__path.append(key)
+
+        for i, move in enumerate(self.__order(position, moves, tt_move, ply)):
+            quiet = mailbox[(move >> 6) & 63] is None and move >> 12 != EN_PASSANT and move >> 12 < PROMOTION
+
+            token = position.make_move(move)
+            if i == 0:
+                score = -self.__negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            else: # Null window first, searching again only if the move is better
+                score = -self.__negamax(position, depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self.__negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            position.unmake_move(token)
+
+            if self.__stopped:
+                break
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if not ply:
+                    self.__root_move = move
+
+                if score > alpha:
+                    alpha = score
+                    if score >= beta:
+                        if quiet:
+                            self.__reward(move, player, depth, ply)
+                        break
+
+        self.__path.pop()
+        if self.__stopped:
+            return 0
+
+        if best_score >= beta:
+            bound = LOWER
+        elif best_score > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER
+        self.__table.store(key, best_move, depth, bound, _to_table(best_score, ply))
+
+        return best_score
+
+    def __quiescence(self, position: Position, alpha: int, beta: int, ply: int) -> int:
+        if not self.__nodes & CHECK_INTERVAL:
+            self.__check_limits()
+        if self.__stopped:
+            return 0
+        self.__nodes += 1
+
+        if ply >= MAX_PLY - 1:
+            return evaluate(position)
+
+        player = position.turn
+        in_xeque = position.is_square_attacked(position.king_square(player), 1 - player)
+        moves = legal_moves(position)
+
+        if in_xeque: # Every evasion is searched, there is no standing pat
+            if not moves:
+                return -MATE + ply
+            best_score = -INFINITY
+        else:
+            best_score = evaluate(position)
+            if best_score >= beta:
+                return best_score
+            alpha = max(alpha, best_score)
+
+            mailbox = position.mailbox
+            moves = [
+                move for move in moves
+                if mailbox[(move >> 6) & 63] is not None or move >> 12 == EN_PASSANT or move >> 12 == _QUEEN_PROMOTION
+            ]
+
+        for move in self.__order(position, moves, 0, ply):
+            token = position.make_move(move)
+            score = -self.__quiescence(position, -beta, -alpha, ply + 1)
+            position.unmake_move(token)
+
+            if self.__stopped:
+                return 0
+
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if score >= beta:
+                        break
+
+        return best_score
+
+    def __order(self, position: Position, moves: list, tt_move: int, ply: int) -> list:
+        mailbox = position.mailbox
+        killers = self.__killers[ply]
+        history = self.__history[position.turn]
+        keyed = list()
+
+        for move in moves:
+            victim = mailbox[(move >> 6) & 63]
+            move_flag = move >> 12
+
+            if move == tt_move:
+                score = _TT_MOVE
+            elif victim is not None or move_flag == EN_PASSANT or move_flag == _QUEEN_PROMOTION:
+                victim_kind = victim.KIND if victim is not None else PAWN
+                score = _CAPTURE + (victim_kind << 3) - mailbox[move & 63].KIND
+                if move_flag == _QUEEN_PROMOTION:
+                    score += QUEEN << 3
+            elif move == killers[0]:
+                score = _KILLER + 1
+            elif move == killers[1]:
+                score = _KILLER
+            else:
+                score = history[move & 4095]
+
+            keyed.append((score << 16) | move)
+
+        keyed.sort(reverse=True)
+
+        return [move & 0xFFFF for move in keyed]
+
+    def __reward(self, move: int, player: int, depth: int, ply: int) -> None:
+        killers = self.__killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+        history = self.__history[player]
+        history[move & 4095] += depth * depth
+        if history[move & 4095] >= _HISTORY_LIMIT:
+            for i in range(4096):
+                history[i] >>= 1
+
+    def __principal_variation(self, position: Position, depth: int) -> list:
+        pv = list()
+        tokens = list()
+        seen = set()
+        move = self.__root_move
+
+        while move and len(pv) < depth and position.key not in seen and move in legal_moves(position):
+            seen.add(position.key)
+            pv.append(move)
+            tokens.append(position.make_move(move))
+
+            entry = self.__table.probe(position.key)
+            move = entry[0] if entry is not None else 0
+
+        for token in reversed(tokens):
+            position.unmake_move(token)
+
+        return pv
+
+
+def _to_table(score: int, ply: int) -> int:
+    """Makes mate scores relative to the stored position instead of the root."""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+
+    return score
+
+
+def _from_table(score: int, ply: int) -> int:
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+
+    return score
@@ -0,0 +1,440 @@
+"""Endgame tablebases module.
+
+Covers the king and one piece against a lone king endings: KQK, KRK and KPK
+(KK, KBK and KNK are always drawn). Each table is built for the first player
+holding the piece; positions where the second player holds it are probed
+mirrored (rows flipped and players swapped).
+
+A table entry is indexed by (player to move, strong king, piece, weak king)
+squares and holds the result in the point of view of the player to move
+(win, draw or loss) and the distance to mate in plies.
+
+File layout: magic, table name (8 bytes), entries count (uint64), the
+results packed in 2 bits per entry (0 draw, 1 win, 2 loss, 3 illegal
+position), then the distances to mate (uint8 per entry). Tables are read
+through memory maps, so a probe is one index computation and two byte reads.
+
+usage: python -m app.engine.tablebase generate DIRECTORY [--workers N]
+       python -m app.engine.tablebase probe DIRECTORY FEN
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+
+from app.model.attacks import KING_ATTACKS, PAWN_ATTACKS, queen_attacks, tower_attacks
+from app.model.bitboard import BISHOP, HORSE, KING, PAWN, QUEEN, TOWER, lsb, popcount, squares
+from app.model.fen import parse_fen
+from app.model.movegen import legal_moves
+from app.model.moves import move_name
+from app.model.position import Position
+
+
+MAGIC = b"CHESSTB1"
+HEADER = struct.Struct("<8s8sQ")
+EXTENSION = ".ctb"
+ENTRIES = 2 * 64 * 64 * 64
+
+DRAW, WIN, LOSS, ILLEGAL = range(4) # Stored results
+TABLES = {QUEEN: "KQK", TOWER: "KRK", PAWN: "KPK"} # Built in this order (KPK promotes into the others)
+DRAWN_KINDS = (HORSE, BISHOP) # Can't mate
+
+
+class TablebaseResult(NamedTuple):
+    wdl: int # 1 win, 0 draw, -1 loss in the point of view of the player to move
+    dtm: int # Plies to mate (0 for draws)
+
+
+def table_index(turn: int, strong_king: int, piece: int, weak_king: int) -> int:
+    """Returns the entry index of a position with the first player holding the piece."""
+    return (((turn << 6) | strong_king) << 6 | piece) << 6 | weak_king
+
+
+class Tablebase:
+    def __init__(self, path: str):
+        """
+            Reads a table file through a read only memory map.
+
+            params:
+                path: The table file path.
+        """
+        with open(path, "rb") as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, name, count = HEADER.unpack_from(self.__map, 0)
+        if magic != MAGIC or count != ENTRIES:
+            self.__map.close()
+            raise ValueError(f"{path} isn't a tablebase.")
+
+        self.name = name.rstrip(b"\0").decode("ascii")
+        self.__dtm_offset = HEADER.size + ENTRIES // 4
+
+    def probe_index(self, index: int) -> tuple:
+        """Returns the stored (result, distance to mate) of an entry."""
+        wdl = self.__map[HEADER.size + (index >> 2)] >> ((index & 3) << 1) & 3
+
+        return wdl, self.__map[self.__dtm_offset + index]
+
+    def close(self) -> None:
+        """Unmaps the file."""
+        self.__map.close()
+
+
+class Tablebases:
+    def __init__(self, directory: str):
+        """
+            Loads every table found in a directory.
+
+            params:
+                directory: The tables directory (see generate).
+        """
+        self.__tables = dict()
+
+        for kind, name in TABLES.items():
+            path = os.path.join(directory, name + EXTENSION)
+            if os.path.exists(path):
+                self.__tables[kind] = Tablebase(path)
+
+    def covers(self, position: Position) -> bool:
+        """Checks if a position's material is covered by the loaded tables."""
+        return self.__material(position) is not None
+
+    def probe(self, position: Position) -> TablebaseResult:
+        """
+            Looks up a position.
+
+            params:
+                position: The Position object.
+
+            return: A TablebaseResult object or None if the position isn't
+            covered.
+        """
+        material = self.__material(position)
+        if material is None:
+            return None
+
+        kind, strong = material
+        if kind in DRAWN_KINDS or kind == KING:
+            return TablebaseResult(0, 0)
+
+        mirror = 56 if strong == 1 else 0 # Flips the rows
+        bitboards = position.bitboards
+        index = table_index(
+            position.turn ^ strong,
+            lsb(bitboards[strong][KING]) ^ mirror,
+            lsb(bitboards[strong][kind]) ^ mirror,
+            lsb(bitboards[1 - strong][KING]) ^ mirror
+        )
+        wdl, dtm = self.__tables[kind].probe_index(index)
+
+        if wdl == ILLEGAL:
+            return None
+
+        return TablebaseResult((0, 1, -1)[wdl], dtm)
+
+    def best_move(self, position: Position) -> int:
+        """
+            Finds a move keeping the best result: the fastest mate when
+            winning, the slowest one when losing.
+
+            params:
+                position: The Position object.
+
+            return: The packed move or None if the position isn't covered or
+            there is no legal move.
+        """
+        if not self.covers(position):
+            return None
+
+        best_move = None
+        best_rank = None
+
+        for move in legal_moves(position):
+            token = position.make_move(move)
+            result = self.probe(position)
+            position.unmake_move(token)
+
+            if result is None: # Leaves the covered material (e.g. KK after a capture)
+                result = TablebaseResult(0, 0)
+
+            # Child loss in few plies first, then draws, then child wins in many plies
+            rank = (-result.wdl, result.dtm if result.wdl == 1 else -result.dtm)
+            if best_rank is None or rank > best_rank:
+                best_move, best_rank = move, rank
+
+        return best_move
+
+    def __material(self, position: Position) -> tuple:
+        if popcount(position.occupied) > 3:
+            return None
+
+        for strong in range(2):
+            pieces = position.occupancy[strong] & ~position.bitboards[strong][KING]
+            if not pieces:
+                continue
+
+            kind = position.mailbox[lsb(pieces)].KIND
+            if kind in DRAWN_KINDS or kind in self.__tables:
+                return kind, strong
+            return None
+
+        return KING, 0 # Bare kings
+
+
+_tables = dict() # Promotion tables opened by each generation worker
+
+
+def _expand(kind: int, turn: int, strong_king: int, directory: str) -> tuple:
+    """
+        Generates the moves of the positions with a given player to move and
+        strong king square (the generation work unit).
+
+        return: A tuple of numpy ndarrays: the legal positions, the children
+        count of each one, the (parent, child) internal edges, the (parent,
+        child result, child distance) edges leaving the table and the mated
+        positions.
+    """
+    legal = list()
+    counts = list()
+    parents = list()
+    children = list()
+    external = list()
+    mated = list()
+
+    for piece in range(64):
+        if piece == strong_king or (kind == PAWN and piece >> 3 in (0, 7)):
+            continue
+
+        for weak_king in range(64):
+            if weak_king in (strong_king, piece) or KING_ATTACKS[strong_king] >> weak_king & 1:
+                continue
+
+            occupied = (1 << strong_king) | (1 << piece) | (1 << weak_king)
+            attacks = _piece_attacks(kind, piece, occupied)
+            if turn == 0 and attacks >> weak_king & 1: # The player not to move can't be under xeque
+                continue
+
+            index = table_index(turn, strong_king, piece, weak_king)
+            legal.append(index)
+            count = 0
+
+            if turn == 0:
+                for to in squares(KING_ATTACKS[strong_king] & ~KING_ATTACKS[weak_king] & ~(1 << piece)):
+                    parents.append(index)
+                    children.append(table_index(1, to, piece, weak_king))
+                    count += 1
+
+                if kind == PAWN:
+                    destinations = _pawn_pushes(piece, occupied)
+                else:
+                    destinations = attacks & ~(1 << strong_king) & ~(1 << weak_king)
+
+                for to in squares(destinations):
+                    if kind == PAWN and to >> 3 == 0:
+                        for promoted in (QUEEN, TOWER):
+                            wdl, dtm = _table(promoted, directory).probe_index(
+                                table_index(1, strong_king, to, weak_king)
+                            )
+                            external.append((index, wdl, dtm))
+                        external.append((index, DRAW, 0)) # Minor piece promotions
+                        count += 3
+                    else:
+                        parents.append(index)
+                        children.append(table_index(1, strong_king, to, weak_king))
+                        count += 1
+
+            else:
+                without_king = occupied ^ (1 << weak_king)
+                for to in squares(KING_ATTACKS[weak_king] & ~KING_ATTACKS[strong_king]):
+                    if to == piece:
+                        external.append((index, DRAW, 0)) # Bare kings
+                        count += 1
+                    elif not _piece_attacks(kind, piece, without_king) >> to & 1:
+                        parents.append(index)
+                        children.append(table_index(0, strong_king, piece, to))
+                        count += 1
+
+                if not count and attacks >> weak_king & 1:
+                    mated.append(index)
+
+            counts.append(count)
+
+    return (
+        np.array(legal, np.int32), np.array(counts, np.int32),
+        np.array(parents, np.int32), np.array(children, np.int32),
+        np.array(external, np.int32).reshape(-1, 3), np.array(mated, np.int32)
+    )
+
+
+def _piece_attacks(kind: int, sq: int, occupied: int) -> int:
+    if kind == QUEEN:
+        return queen_attacks(sq, occupied)
+    if kind == TOWER:
+        return tower_attacks(sq, occupied)
+
+    return PAWN_ATTACKS[0][sq]
+
+
+def _pawn_pushes(sq: int, occupied: int) -> int:
+    pushes = 0
+
+    if not occupied >> (sq - 8) & 1:
+        pushes |= 1 << (sq - 8)
+        if sq >> 3 == 6 and not occupied >> (sq - 16) & 1:
+            pushes |= 1 << (sq - 16)
+
+    return pushes
+
+
+def _table(kind: int, directory: str) -> Tablebase:
+    if kind not in _tables:
+        _tables[kind] = Tablebase(os.path.join(directory, TABLES[kind] + EXTENSION))
+
+    return _tables[kind]
+
+
+def generate_table(kind: int, directory: str, workers: int = None) -> int:
+    """
+        Builds a table by retrograde analysis and writes it to the directory.
+
+        The moves of every position are generated in parallel, then the
+        results are propagated backwards from the mates one ply at a time: a
+        position is won as soon as one child is lost, and lost once every
+        child is won.
+
+        params:
+            kind: The piece kind (QUEEN, TOWER or PAWN). KPK needs the KQK and
+            KRK tables in the directory.
+            directory: The tables directory.
+            workers: The number of worker processes (None for one per CPU).
+
+        return: The longest distance to mate in plies.
+    """
+    tasks = [(turn, king) for turn in range(2) for king in range(64)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parts = list(executor.map(
+            _expand, *zip(*[(kind, turn, king, directory) for turn, king in tasks]), chunksize=4
+        ))
+
+    legal, counts, parents, children, external, mated = (np.concatenate(part) for part in zip(*parts))
+
+    wdl = np.full(ENTRIES, ILLEGAL, np.uint8)
+    dtm = np.zeros(ENTRIES, np.int32)
+    wdl[legal] = DRAW
+    remaining = np.zeros(ENTRIES, np.int32) # Children not known to be won yet
+    remaining[legal] = counts
+    resolved = np.zeros(ENTRIES, bool)
+
+    # Parents of each child, grouped by child
+    order = np.argsort(children, kind="stable")
+    parents_by_child = parents[order]
+    starts = np.searchsorted(children[order], np.arange(ENTRIES + 1))
+
+    # Edges leaving the table, grouped by the child's distance to mate
+    external = external[external[:, 1] != DRAW]
+    external_by_depth = {depth: external[external[:, 2] == depth] for depth in np.unique(external[:, 2]).tolist()}
+
+    wdl[mated] = LOSS
+    resolved[mated] = True
+    frontier = mated
+    depth = 0
+
+    while len(frontier) or any(d >= depth for d in external_by_depth):
+        lengths = starts[frontier + 1] - starts[frontier]
+        edges = parents_by_child[np.repeat(starts[frontier], lengths) + _ranges(lengths)]
+        lost = np.repeat(wdl[frontier] == LOSS, lengths)
+
+        extra = external_by_depth.get(depth, np.zeros((0, 3), np.int32))
+        edges = np.concatenate([edges, extra[:, 0]])
+        lost = np.concatenate([lost, extra[:, 1] == LOSS])
+
+        winners = np.unique(edges[lost])
+        winners = winners[~resolved[winners]]
+        wdl[winners] = WIN
+        dtm[winners] = depth + 1
+        resolved[winners] = True
+
+        decremented = edges[~lost]
+        np.subtract.at(remaining, decremented, 1)
+        losers = np.unique(decremented)
+        losers = losers[~resolved[losers] & (remaining[losers] == 0)]
+        wdl[losers] = LOSS
+        dtm[losers] = depth + 1
+        resolved[losers] = True
+
+        frontier = np.concatenate([winners, losers]).astype(np.int32)
+        depth += 1
+
+    if dtm.max() > 255:
+        raise ValueError("Distance to mate doesn't fit a byte.")
+
+    packed = (wdl.reshape(-1, 4) << np.array([0, 2, 4, 6], np.uint8)).sum(axis=1, dtype=np.uint8)
+    with open(os.path.join(directory, TABLES[kind] + EXTENSION), "wb") as file:
+        file.write(HEADER.pack(MAGIC, TABLES[kind].encode("ascii"), ENTRIES))
+        file.write(packed.tobytes())
+        file.write(dtm.astype(np.uint8).tobytes())
+
+    return int(dtm.max())
+
+
+def _ranges(lengths: np.ndarray) -> np.ndarray:
+    """Concatenates arange(length) for each length."""
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    return np.arange(offsets.size) - offsets
+
+
+def generate(directory: str, workers: int = None) -> None:
+    """
+        Builds every table (see generate_table) into a directory.
+
+        params:
+            directory: The tables directory (created if it doesn't exist).
+            workers: The number of worker processes (None for one per CPU).
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    for kind, name in TABLES.items():
+        longest = generate_table(kind, directory, workers)
+        print(f"{name}: longest mate in {longest} plies", file=sys.stderr)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Generates or probes the endgame tablebases")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("generate", help="build every table")
+    build.add_argument("directory", help="tables directory")
+    build.add_argument("--workers", type=int, help="worker processes (defaults to one per CPU)")
+
+    probe = commands.add_parser("probe", help="show the result and best move of a position")
+    probe.add_argument("directory", help="tables directory")
+    probe.add_argument("fen", help="position FEN string")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        generate(args.directory, args.workers)
+        return 0
+
+    tablebases = Tablebases(args.directory)
+    position = parse_fen(args.fen)
+    result = tablebases.probe(position)
+    if result is None:
+        print("Position not covered")
+        return 1
+
+    move = tablebases.best_move(position)
+    outcome = {1: "win", 0: "draw", -1: "loss"}[result.wdl]
+    print(f"{outcome} (mate in {result.dtm} plies)  best move {move_name(move) if move else '-'}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
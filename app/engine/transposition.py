@@ -0,0 +1,82 @@
+"""Transposition table module
+"""
+EXACT, LOWER, UPPER = range(3)
+
+_SCORE_OFFSET = 1 << 20
+
+
+class TranspositionTable:
+    def __init__(self, bits: int = 18):
+        """
+            Fixed size transposition table.
+
+            The table is allocated once with 2 ** bits slots. Each slot keeps the
+            full position key and one packed int (move, depth, bound, search
+            generation and score), so storing never allocates containers.
+
+            A slot is replaced when it is empty, holds the same position, comes
+            from an older search or was searched less deep than the new entry.
+
+            params:
+                bits: The log2 of the number of slots.
+        """
+        self.__mask = (1 << bits) - 1
+        self.__keys = [0] * (1 << bits)
+        self.__data = [0] * (1 << bits)
+        self.__generation = 0
+
+    def __len__(self) -> int:
+        return len(self.__keys)
+
+    def new_search(self) -> None:
+        """Starts a new search generation so older entries get replaced first."""
+        self.__generation = (self.__generation + 1) & 63
+
+    def clear(self) -> None:
+        """Empties every slot."""
+        size = len(self.__keys)
+        self.__keys = [0] * size
+        self.__data = [0] * size
+
+    def probe(self, key: int) -> tuple:
+        """
+            Looks up a position.
+
+            params:
+                key: The position Zobrist key.
+
+            return: A (move, depth, bound, score) tuple or None if it isn't stored.
+        """
+        index = key & self.__mask
+        if self.__keys[index] != key:
+            return None
+
+        data = self.__data[index]
+
+        return data & 0xFFFF, (data >> 16) & 0xFF, (data >> 24) & 3, (data >> 32) - _SCORE_OFFSET
+
+    def store(self, key: int, move: int, depth: int, bound: int, score: int) -> None:
+        """
+            Stores a search result according to the replacement policy.
+
+            params:
+                key: The position Zobrist key.
+                move: The best packed move (0 if unknown).
+                depth: The searched depth.
+                bound: EXACT, LOWER or UPPER.
+                score: The score in the point of view of the player to move.
+        """
+        index = key & self.__mask
+        data = self.__data[index]
+        stored_key = self.__keys[index]
+
+        if stored_key and stored_key != key and (data >> 26) & 63 == self.__generation\
+                and (data >> 16) & 0xFF > depth:
+            return
+
+        if stored_key == key and not move: # Keep the known best move
+            move = data & 0xFFFF
+
+        self.__keys[index] = key
+        self.__data[index] = move | (depth << 16) | (bound << 24) | (self.__generation << 26)\
+            | ((score + _SCORE_OFFSET) << 32)
@@ -0,0 +1,116 @@
+"""Background search module.
+
+A SearchWorker runs the engine on its own thread, over a copy of the game
+table, so the window keeps drawing and reading input while it thinks. Each
+completed iteration is posted to the worker, where the owner polls the best
+move and principal variation so far. A search is cancelled by stopping the
+engine, which returns its best move at the next node budget check.
+
+Threads share the engine transposition table between searches: pondering
+the human's turn leaves it filled for the engine's next move.
+"""
+import threading
+
+from app.engine.search import Engine, SearchResult
+from app.model.chess_table import ChessTable
+
+
+JOIN_INTERVAL = 0.01 # Seconds between stop requests while a search winds down
+
+
+class SearchWorker:
+    def __init__(self, engine: Engine):
+        """
+            Runs the searches of an engine off the caller's thread, one at a
+            time.
+
+            params:
+                engine: The Engine object (only the worker may use it while a
+                search runs).
+        """
+        self.__engine = engine
+        self.__thread = None
+        self.__result = None
+        self.__done = False
+        self.__cancelled = False
+        self.__key = None
+
+    def start(
+            self,
+            table: ChessTable,
+            time_limit: float = None,
+            node_limit: int = None,
+            key = None
+        ) -> None:
+        """
+            Starts searching a position, cancelling the running search.
+
+            params:
+                table: The ChessTable object (it's copied, the caller keeps
+                using it).
+                time_limit: The time budget in seconds (None to search until
+                stopped, for pondering).
+                node_limit: The nodes budget (None for no limit).
+                key: Any value naming the search, returned by get_key.
+        """
+        self.stop()
+
+        self.__result = None
+        self.__done = False
+        self.__cancelled = False
+        self.__key = key
+        self.__thread = threading.Thread(
+            target=self.__run, args=(table.copy(), time_limit, node_limit), daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """Cancels the running search and waits for its thread to end."""
+        thread = self.__thread
+        if thread is None:
+            return
+
+        self.__cancelled = thread.is_alive()
+        while thread.is_alive(): # The search may not have started yet, which resets the stop request
+            self.__engine.stop()
+            thread.join(JOIN_INTERVAL)
+
+        self.__thread = None
+        if self.__cancelled: # A cancelled search never gets done, the same key has to start it again
+            self.__key = None
+
+    def is_running(self) -> bool:
+        """Checks if a search is running."""
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def is_done(self) -> bool:
+        """Checks if the last search ended by itself (its limits or a mate found)."""
+        return self.__done
+
+    def get_key(self):
+        """Returns the key of the last started search (None once it's cancelled)."""
+        return self.__key
+
+    def get_result(self) -> SearchResult:
+        """
+            Returns the last posted result: the final one once the search is
+            done, else the last completed iteration (None before the first).
+        """
+        return self.__result
+
+    def new_game(self) -> None:
+        """Cancels the running search and clears the engine memory."""
+        self.stop()
+        self.__result = None
+        self.__done = False
+        self.__key = None
+        self.__engine.new_game()
+
+    def __run(self, table: ChessTable, time_limit: float, node_limit: int) -> None:
+        result = self.__engine.search(table, time_limit=time_limit, node_limit=node_limit, callback=self.__post)
+
+        self.__result = result
+        self.__done = not self.__cancelled
+
+    def __post(self, result: SearchResult) -> None:
+        self.__result = result # A single reference assignment, readers see the old or the new one
@@ -0,0 +1,127 @@
+"""Precomputed attack tables module.
+
+All tables are indexed by square (first player's point of view, see
+app.model.bitboard). Sliding pieces use PEXT style lookups: every square owns
+a dict mapping the relevant blockers (the occupancy masked by the square's
+rays, borders excluded) to its attacks, so an attack set is a single mask
+plus a dict lookup. The slider dicts are filled on their first lookup of each
+blockers set: building all of them up front costs seconds and tens of MB in
+every process importing the model, and games only ever meet a small part.
+"""
+from app.model.bitboard import EMPTY
+
+
+HORSE_DIRECTIONS = ((1, 2), (1, -2), (-1, 2), (-1, -2), (2, 1), (2, -1), (-2, 1), (-2, -1))
+KING_DIRECTIONS = ((-1, 0), (1, 0), (0, 1), (0, -1), (-1, 1), (-1, -1), (1, 1), (1, -1))
+BISHOP_DIRECTIONS = ((-1, 1), (-1, -1), (1, 1), (1, -1))
+TOWER_DIRECTIONS = ((-1, 0), (1, 0), (0, 1), (0, -1))
+PAWN_DIRECTIONS = (-1, 1) # Forward row step of each player
+
+
+def _inside(row: int, col: int) -> bool:
+    return 0 <= row <= 7 and 0 <= col <= 7
+
+
+def _jumps(sq: int, directions: tuple) -> int:
+    row, col = divmod(sq, 8)
+    bitboard = EMPTY
+
+    for d_row, d_col in directions:
+        if _inside(row + d_row, col + d_col):
+            bitboard |= 1 << ((row + d_row) * 8 + col + d_col)
+
+    return bitboard
+
+
+def _rays(sq: int, directions: tuple, occupied: int = EMPTY, edges: bool = True) -> int:
+    """Walks each direction until the board edge or the first blocker."""
+    row, col = divmod(sq, 8)
+    bitboard = EMPTY
+
+    for d_row, d_col in directions:
+        r, c = row + d_row, col + d_col
+        while _inside(r, c):
+            if not edges and not _inside(r + d_row, c + d_col):
+                break
+
+            bit = 1 << (r * 8 + c)
+            bitboard |= bit
+            if occupied & bit:
+                break
+
+            r, c = r + d_row, c + d_col
+
+    return bitboard
+
+
+class _SliderAttacks(dict):
+    """Attacks of a slider on a square by blockers, computed on the first lookup."""
+    __slots__ = ("sq", "directions")
+
+    def __init__(self, sq: int, directions: tuple):
+        super().__init__()
+        self.sq = sq
+        self.directions = directions
+
+    def __missing__(self, blockers: int) -> int:
+        attacks = self[blockers] = _rays(self.sq, self.directions, blockers)
+
+        return attacks
+
+
+def _slider_table(directions: tuple) -> tuple:
+    masks = [_rays(sq, directions, edges=False) for sq in range(64)]
+    tables = [_SliderAttacks(sq, directions) for sq in range(64)]
+
+    return masks, tables
+
+
+def _line(a: int, b: int, between: bool) -> int:
+    """Squares strictly between a and b (or the whole line) if they are aligned."""
+    row_a, col_a = divmod(a, 8)
+    row_b, col_b = divmod(b, 8)
+    d_row, d_col = row_b - row_a, col_b - col_a
+
+    if a == b or not (d_row == 0 or d_col == 0 or abs(d_row) == abs(d_col)):
+        return EMPTY
+
+    d_row = (d_row > 0) - (d_row < 0)
+    d_col = (d_col > 0) - (d_col < 0)
+
+    if not between:
+        return _rays(a, ((d_row, d_col), (-d_row, -d_col))) | (1 << a)
+
+    bitboard = EMPTY
+    r, c = row_a + d_row, col_a + d_col
+    while (r, c) != (row_b, col_b):
+        bitboard |= 1 << (r * 8 + c)
+        r, c = r + d_row, c + d_col
+
+    return bitboard
+
+
+HORSE_ATTACKS = [_jumps(sq, HORSE_DIRECTIONS) for sq in range(64)]
+KING_ATTACKS = [_jumps(sq, KING_DIRECTIONS) for sq in range(64)]
+PAWN_ATTACKS = [[_jumps(sq, ((step, -1), (step, 1))) for sq in range(64)] for step in PAWN_DIRECTIONS]
+PAWN_PUSHES = [[_jumps(sq, ((step, 0),)) for sq in range(64)] for step in PAWN_DIRECTIONS]
+
+BISHOP_MASKS, BISHOP_TABLE = _slider_table(BISHOP_DIRECTIONS)
+TOWER_MASKS, TOWER_TABLE = _slider_table(TOWER_DIRECTIONS)
+
+BETWEEN = [[_line(a, b, True) for b in range(64)] for a in range(64)]
+LINE = [[_line(a, b, False) for b in range(64)] for a in range(64)]
+
+
+def bishop_attacks(sq: int, occupied: int) -> int:
+    """Returns the squares attacked by a bishop given the board occupancy."""
+    return BISHOP_TABLE[sq][occupied & BISHOP_MASKS[sq]]
+
+
+def tower_attacks(sq: int, occupied: int) -> int:
+    """Returns the squares attacked by a tower given the board occupancy."""
+    return TOWER_TABLE[sq][occupied & TOWER_MASKS[sq]]
+
+
+def queen_attacks(sq: int, occupied: int) -> int:
+    """Returns the squares attacked by a queen given the board occupancy."""
+    return BISHOP_TABLE[sq][occupied & BISHOP_MASKS[sq]] | TOWER_TABLE[sq][occupied & TOWER_MASKS[sq]]
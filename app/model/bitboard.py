@@ -0,0 +1,89 @@
+"""Bitboard utilities module.
+
+Squares are numbered from 0 to 63 in the first player's point of view, row by
+row (square = row * 8 + column), so the bit n of a bitboard is the square n.
+"""
+import numpy as np
+
+
+PAWN, HORSE, BISHOP, TOWER, QUEEN, KING = range(6)
+
+EMPTY = 0
+FULL = (1 << 64) - 1
+
+
+def square(coordinates: tuple, turned: bool = False) -> int:
+    """
+        Converts (row, column) coordinates to a square index.
+
+        params:
+            coordinates: A (row, column) pair.
+            turned: If the coordinates are in the second player's point of view.
+
+        return: The square index (0 to 63).
+    """
+    sq = int(coordinates[0]) * 8 + int(coordinates[1])
+
+    return 63 - sq if turned else sq
+
+
+def coordinates(sq: int, turned: bool = False) -> tuple:
+    """
+        Converts a square index to (row, column) coordinates.
+
+        params:
+            sq: The square index (0 to 63).
+            turned: If it's True gets the coordinates in the second player's
+            point of view.
+
+        return: A (row, column) tuple.
+    """
+    return divmod(63 - sq if turned else sq, 8)
+
+
+def square_name(sq: int) -> str:
+    """Returns the algebraic name of a square (e.g. 'e4')."""
+    return "abcdefgh"[sq & 7] + str(8 - (sq >> 3))
+
+
+def parse_square(name: str) -> int:
+    """Returns the square index of an algebraic square name (e.g. 'e4')."""
+    col = "abcdefgh".index(name[0])
+    row = 8 - int(name[1])
+
+    if not 0 <= row <= 7:
+        raise ValueError(f"Invalid square name {name}.")
+
+    return row * 8 + col
+
+
+def lsb(bitboard: int) -> int:
+    """Returns the index of the least significant set bit (-1 if empty)."""
+    return (bitboard & -bitboard).bit_length() - 1
+
+
+def squares(bitboard: int):
+    """Yields the index of every set bit of a bitboard."""
+    while bitboard:
+        bit = bitboard & -bitboard
+        yield bit.bit_length() - 1
+        bitboard ^= bit
+
+
+def popcount(bitboard: int) -> int:
+    """Counts the set bits of a bitboard."""
+    return bin(bitboard).count("1")
+
+
+def to_array(bitboard: int) -> np.ndarray:
+    """Unpacks a bitboard into a (8, 8) shaped numpy ndarray of 0 and 1."""
+    packed = np.array([bitboard], dtype="<u8").view(np.uint8)
+
+    return np.unpackbits(packed, bitorder="little").reshape(8, 8)
+
+
+def from_array(mask: np.ndarray) -> int:
+    """Packs a (8, 8) shaped boolean numpy ndarray into a bitboard."""
+    packed = np.packbits(np.asarray(mask, dtype=bool).ravel(), bitorder="little")
+
+    return int.from_bytes(packed.tobytes(), "little")
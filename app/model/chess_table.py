@@ -1,43 +1,114 @@
 """Chess Table class module
 """
-from copy import deepcopy
+from array import array
+from collections import Counter
 
 import numpy as np
 
+from app.model.attacks import PAWN_PUSHES
+from app.model.bitboard import KING, PAWN, QUEEN, coordinates as to_coordinates, lsb, square, squares, to_array
+from app.model.fen import parse_fen, to_fen
+from app.model.movegen import legal_moves, perft
+from app.model.moves import (
+    DOUBLE_PUSH, EN_PASSANT, NORMAL, ROCK, destination, encode, move_name, origin, promotion_flag
+)
 from app.model.pieces import *
 from app.model.pieces.piece import Piece
+from app.model.position import Position
 from app.utils.exceptions import *
-from app.utils.special_plays import SpecialPlays
 
 
 class ChessTable:
     def __init__(self):
         """Chess Table class."""
-        self.__pieces = list()
-        self.__last_move = None
+        self.__position = Position()
+
+        # Friends (1) and enemies (2) of each player, kept up to date move by move
+        self.__grids = np.zeros((2, 64), dtype=np.int8)
+        self.__grid_views = [grid.reshape(8, 8) for grid in self.__grids]
+        for view in self.__grid_views:
+            view.flags.writeable = False
+
         self.reset_table()
 
     def reset_table(self):
         """Reset all pieces location for a new game."""
-        self.__pieces = [list() for i in range(2)]
+        self.__position = Position()
+        self.__start_fen = None
 
         locs = {
             Pawn: [(6, i) for i in range(8)],
             Tower: [(7, 0), (7, 7)],
             Horse: [(7, 1), (7, 6)],
-            Bishop: [(7, 2), (7, 5)]
+            Bishop: [(7, 2), (7, 5)],
+            King: [(7, 4)],
+            Queen: [(7, 3)]
         }
 
         for i in range(2):
-            locs[King] = [(7, 4 - i)]
-            locs[Queen] = [(7, 3 + i)]
-            
             for piece_type in locs.keys():
                 for loc in locs[piece_type]:
-                    self.__pieces[i].append(
-                        piece_type(coordinates=loc, player=i)
+                    self.__position.put(
+                        piece_type(coordinates=(loc[0] if i == 0 else 7 - loc[0], loc[1]), player=i)
                     )
+
+        self.__position.rehash()
+        self.__fill_grids()
+        self.__new_history()
     
+    def load_fen(self, fen: str) -> None:
+        """
+            Sets up the position described by a FEN string.
+
+            params:
+                fen: The FEN string.
+        """
+        self.__position = parse_fen(fen)
+        self.__start_fen = fen
+        self.__fill_grids()
+        self.__new_history()
+
+    def get_fen(self) -> str:
+        """Returns the FEN string of the current position."""
+        return to_fen(self.__position)
+
+    def get_start_fen(self) -> str:
+        """Returns the FEN string the game started from (None for the standard start)."""
+        return self.__start_fen
+
+    def get_moves(self) -> list:
+        """Returns the packed moves played on the table since the game started."""
+        return list(self.__moves)
+
+    def get_hashes(self) -> list:
+        """
+            Returns the Zobrist keys of every position since the game started,
+            the current one last.
+        """
+        return list(self.__hashes)
+
+    def copy(self) -> "ChessTable":
+        """
+            Returns an independent table with the same game (starting position
+            and moves, so repetitions are kept), for searching it on another
+            thread while this one is still drawn and played.
+        """
+        table = ChessTable()
+        if self.__start_fen is not None:
+            table.load_fen(self.__start_fen)
+
+        for move in self.__moves:
+            table.make_move(move)
+
+        return table
+
+    def position_hash(self) -> int:
+        """
+            Returns the 64 bits Zobrist key of the current position (pieces,
+            player to move, rock rights and en passant file).
+        """
+        return self.__position.key
+
     def get_friends_n_enemies(self, player: int) -> np.ndarray:
         """
             Returns a (8, 8) shaped numpy ndarray with all friends (filled with 1)
@@ -46,158 +117,348 @@ class ChessTable:
             params:
                 player: An int number indicating the player (0 or 1).
 
-            returns: A numpy ndarray with all friendly and enemy pieces locations.
+            returns: A read only numpy ndarray with all friendly and enemy
+            pieces locations. It's a view over the table, kept up to date by
+            the following moves (copy it to keep a snapshot).
         """
         if player not in [0, 1]:
             raise InvalidPlayerException("The player num must be 0 or 1")
-        
-        inverted = player == 1
-        table = np.zeros((8, 8), dtype=int)
 
-        for i in range(2):
-            player_num = 1 if i == 0 else 2
-
-            if inverted:
-                player_num = (2 * player_num) % 3
-            
-            for piece in self.__pieces[i]:
-                if not piece.isalive():
-                    continue
-
-                loc = piece.get_coordinates(player_num == 2)
-                table[loc[0], loc[1]] = player_num
-
-        return table
+        return self.__grid_views[player]
     
     def get_table(self):
-        return deepcopy(self.__pieces)
+        return [list(pieces) for pieces in self.__position.pieces]
+
+    def get_position(self) -> Position:
+        """
+            Returns the bitboard position core, for engines and analysis.
+            Moves played straight on it aren't validated.
+        """
+        return self.__position
 
-    def move(self, _from: tuple, to: tuple, player: int) -> None:
+    def move(self, _from: tuple, to: tuple, player: int, promotion: int = QUEEN) -> Piece:
         """
             Move an piece located at specifc coordinate to another.
 
             params:
-                _from: Current coordinate.
+                _from: Current coordinate (row 0 is the second player's side,
+                for both players).
                 to: Desired coordinate.
                 player: An int number indicating the player (0 or 1).
+                promotion: The piece kind a pawn reaching the end of the board
+                turns into.
 
             return: An Piece object if it's captured else None.
         """
-        chosen = None
-        for i in range(2):
-            if i != player:
-                continue
-
-            for j, piece in enumerate(self.__pieces[i]):
-                if not piece.isalive():
-                    continue
+        if player != self.__position.turn: # Moving out of turn would desync the turn and the Zobrist key
+            raise ImpossibleMoveException(f"It's not player {player}'s turn.")
 
-                if np.sum(piece.get_coordinates(i != player) == _from) == 2:
-                    chosen = piece
-                    break
-            
-            if chosen is not None:
-                break
+        chosen = self.__position.piece_at(square(_from))
 
-        if chosen is None:
+        if chosen is None or chosen.get_player() != player:
             raise NoPieceAtLocationException("Any piece at given location.")
-        
-        reroll = deepcopy(self.__pieces)
-        table = self.get_friends_n_enemies(player=i)
-        if isinstance(chosen, King):
-            special_play = chosen.move(to, table, towers=self.get_towers(player))
-        elif isinstance(chosen, Pawn):
-            special_play = chosen.move(to, table, last_move=self.get_last_move())
-        else:
-            special_play = chosen.move(to, table)
-
-        if special_play is None:
-            pass
-
-        elif special_play == SpecialPlays.EN_PASSANT:
-            to = (to[0] + 1, to[1])
-
-        elif special_play == SpecialPlays.END_OF_BOARD:
-            self.__pieces[i][j] = Queen(coordinates=to, player=i)
-
-        elif special_play == SpecialPlays.ROCK:
-            for vector in np.array([(0, 1), (0, -1)], dtype=int):
-                tower = self.get_piece_by_loc(chosen.get_coordinates() + vector, turned=player==1)
-                if isinstance(tower, Tower):
-                    break
-
-            tower.move_rock(vector * (-2))   
-
-        captured = None
-        for i in range(2):
-            if i == player:
-                continue
 
-            for piece in self.__pieces[i]:
-                if not piece.isalive():
-                    continue
+        dest = square(to)
+        if not self.__piece_moves(chosen) >> dest & 1:
+            raise ImpossibleMoveException(f"Cannot move this piece to pos {[to[0], to[1]]}.")
 
-                if np.sum(piece.get_coordinates(i != player) == to) == 2:
-                    captured = piece
-                    break
-            
-            if captured is not None:
-                captured.got_captured()
-                break
-        
-        if self.is_under_xeque(player):
-            self.__pieces = reroll
+        move = self.__encode(chosen, dest, promotion)
+        if move not in self.legal_moves(player):
             raise UnderXequeException("This movement puts you under xeque.")
 
-        self.__last_move = to
+        _, _, captured, *_ = self.make_move(move)
 
         return captured
 
-    def get_piece_by_loc(self, coordinates: tuple, turned: bool = False) -> Piece:
+    def play_move(self, move: int) -> Piece:
+        """
+            Plays a packed move (see app.model.moves) of the player to move
+            after checking it's legal.
+
+            params:
+                move: The packed move.
+
+            return: An Piece object if it's captured else None.
+        """
+        if move not in self.legal_moves(self.__position.turn):
+            raise ImpossibleMoveException(f"Illegal move {move_name(move)}.")
+
+        _, _, captured, *_ = self.make_move(move)
+
+        return captured
+
+    def make_move(self, move: int) -> tuple:
+        """
+            Plays a packed move (see app.model.moves) without validating it.
+
+            params:
+                move: The packed move.
+
+            return: An undo token to be given to unmake_move.
+        """
+        self.__undone = array("H") # A new move forgets the undone ones
+
+        return self.__push(move)
+
+    def unmake_move(self, token: tuple) -> None:
+        """
+            Takes back a move played by make_move, restoring captures,
+            promotions, rocks and en passant state.
+
+            params:
+                token: The undo token returned by make_move.
+        """
+        self.__position.unmake_move(token)
+        self.__update_grids(token[0], token[1].get_player())
+
+        self.__moves.pop()
+        self.__tokens.pop()
+        self.__repetitions[self.__hashes.pop()] -= 1
+
+    def undo(self) -> int:
+        """
+            Takes back the last move, which can be played again by redo.
+
+            return: The packed move taken back or None if there isn't any.
+        """
+        if not self.__tokens:
+            return None
+
+        token = self.__tokens[-1]
+        self.unmake_move(token)
+        self.__undone.append(token[0])
+
+        return token[0]
+
+    def redo(self) -> int:
+        """
+            Plays again the last move taken back by undo.
+
+            return: The packed move played or None if there isn't any.
+        """
+        if not self.__undone:
+            return None
+
+        move = self.__undone.pop()
+        self.__push(move)
+
+        return move
+
+    def repetitions(self) -> int:
+        """Counts how many times the current position happened in the game."""
+        return self.__repetitions[self.__position.key]
+
+    def is_threefold_repetition(self) -> bool:
+        """Checks if the current position happened three times."""
+        return self.repetitions() >= 3
+
+    def is_fifty_moves(self) -> bool:
+        """Checks if fifty moves of each player went by without captures or pawn moves."""
+        return self.__position.halfmove >= 100
+
+    def is_draw(self) -> bool:
+        """Checks if the game is drawn by threefold repetition or the fifty moves rule."""
+        return self.is_threefold_repetition() or self.is_fifty_moves()
+
+    def get_piece_by_loc(self, coordinates: tuple) -> Piece:
         """
             Gets the piece located at given coordinates.
 
             params:
                 coordinates: Location to look.
-                turned: If the table is turned (second player look).
 
             return: A Piece object.
         """
-        turn_player = 0 if turned else 1
-        for i in range(2):
-            for piece in self.__pieces[i]:
-                if not piece.isalive():
-                    continue
+        if coordinates is None or not (0 <= coordinates[0] <= 7 and 0 <= coordinates[1] <= 7):
+            return None
 
-                if np.sum(piece.get_coordinates(i == turn_player) == coordinates) == 2:
-                    return piece
+        return self.__position.piece_at(square(coordinates))
 
     def get_king_loc(self, player: int) -> tuple:
-        for piece in self.__pieces[player]:
-            if isinstance(piece, King):
-                return piece.get_coordinates()
+        return to_coordinates(self.__position.king_square(player))
             
-    def get_towers(self, player: int) -> tuple:
-        towers = list()
-        for piece in self.__pieces[player]:
-            if isinstance(piece, Tower) and piece.isalive() and not piece.was_moved():
-                towers.append(piece.get_coordinates())
-        
-        return towers
+    def get_towers(self, player: int) -> list:
+        return [to_coordinates(sq) for sq in squares(self.__position.rock_towers(player))]
     
     def get_last_move(self) -> tuple:
-        if self.__last_move:
-            return np.array([7, 7], dtype=int) - self.__last_move
+        """
+            Returns the coordinates of the pawn that can be captured en passant
+            if any.
+        """
+        position = self.__position
+
+        if position.en_passant is not None:
+            return to_coordinates(lsb(PAWN_PUSHES[1 - position.turn][position.en_passant]))
             
+    def legal_moves(self, player: int) -> list:
+        """
+            Lists every legal move of a player.
+
+            params:
+                player: An int number indicating the player (0 or 1).
+
+            return: A list of packed moves (see app.model.moves).
+        """
+        return legal_moves(self.__position, player)
+
+    def get_legal_moveset(self, piece: Piece) -> list:
+        """
+            Calculates the legal destinations of a piece.
+
+            params:
+                piece: A Piece object on this table.
+
+            return: A list with the (row, column) destination coordinates.
+        """
+        _from = piece.get_square()
+        moves = {destination(move) for move in self.legal_moves(piece.get_player()) if origin(move) == _from}
+
+        return [to_coordinates(sq) for sq in sorted(moves)]
+
+    def perft(self, depth: int) -> int:
+        """
+            Counts the leaf nodes of the legal move tree from the current
+            position, for move generator checks and benchmarks.
+
+            params:
+                depth: The tree depth in plies.
+
+            return: The number of leaf nodes.
+        """
+        return perft(self.__position, depth)
+
+    def divide(self, depth: int) -> dict:
+        """
+            Splits the perft count by root move.
+
+            params:
+                depth: The tree depth in plies (at least 1).
+
+            return: A dict mapping each root move name (e.g. 'e2e4') to its
+            leaf nodes count.
+        """
+        position = self.__position
+        nodes = dict()
+
+        for move in legal_moves(position):
+            token = position.make_move(move)
+            nodes[move_name(move)] = perft(position, depth - 1)
+            position.unmake_move(token)
+
+        return nodes
+
+    def probe_tablebase(self, tablebases) -> tuple:
+        """
+            Looks up the current position in the endgame tablebases.
+
+            params:
+                tablebases: An app.engine.tablebase.Tablebases object.
+
+            return: A (wdl, dtm) TablebaseResult in the point of view of the
+            player to move, wdl being 1 (win), 0 (draw) or -1 (loss) and dtm
+            the plies to mate, or None if the position isn't covered.
+        """
+        return tablebases.probe(self.__position)
+
+    def is_xeque_mate(self, player: int) -> bool:
+        """Checks if a player is under xeque and has no legal move."""
+        return self.is_under_xeque(player) and not self.legal_moves(player)
+
+    def is_stalemate(self, player: int) -> bool:
+        """Checks if a player isn't under xeque but has no legal move."""
+        return not self.is_under_xeque(player) and not self.legal_moves(player)
+
+    def is_square_attacked(self, coordinates: tuple, by_player: int) -> bool:
+        """
+            Checks if a square is attacked by a player.
+
+            params:
+                coordinates: The square location.
+                by_player: The attacking player (0 or 1).
+
+            return: True if any piece of the player attacks the square.
+        """
+        return self.__position.is_square_attacked(square(coordinates), by_player)
+
     def is_under_xeque(self, player: int) -> bool:
-        king_loc = np.array((7, 7), dtype=int) - self.get_king_loc(player)
-        for piece in self.__pieces[(player + 1) % 2]:
-            if not piece.isalive():
-                continue
-            moves = piece.possible_moveset(self.get_friends_n_enemies((player + 1) % 2))
-            if len(moves) == 0:
-                continue
-            if 2 in np.sum(moves == king_loc, axis=1):
-                return True
-            
-        return False
+        position = self.__position
+
+        return position.is_square_attacked(position.king_square(player), 1 - player)
+
+    def __new_history(self) -> None:
+        key = self.__position.key
+        self.__moves = array("H") # Packed moves
+        self.__tokens = list() # Undo tokens of the moves
+        self.__hashes = array("Q", [key]) # Keys of the positions, the current one last
+        self.__repetitions = Counter({key: 1}) # Times each key happened
+        self.__undone = array("H") # Moves taken back, the next one to redo last
+
+    def __push(self, move: int) -> tuple:
+        token = self.__position.make_move(move)
+        self.__update_grids(move, token[1].get_player())
+
+        key = self.__position.key
+        self.__moves.append(move)
+        self.__tokens.append(token)
+        self.__hashes.append(key)
+        self.__repetitions[key] += 1
+
+        return token
+
+    def __fill_grids(self) -> None:
+        occupancy = self.__position.occupancy
+        for player in range(2):
+            self.__grids[player] = (to_array(occupancy[player]) + 2 * to_array(occupancy[1 - player])).ravel()
+
+    def __update_grids(self, move: int, player: int) -> None:
+        """Refreshes the grid squares a move (or its undoing) touched."""
+        _from = move & 63
+        to = (move >> 6) & 63
+        touched = [_from, to]
+
+        move_flag = move >> 12
+        if move_flag == EN_PASSANT:
+            touched.append(lsb(PAWN_PUSHES[1 - player][to]))
+        elif move_flag == ROCK:
+            touched += (to + 1, to - 1) if to > _from else (to - 2, to + 1)
+
+        mailbox = self.__position.mailbox
+        grids = self.__grids
+        for sq in touched:
+            piece = mailbox[sq]
+            if piece is None:
+                grids[0, sq] = grids[1, sq] = 0
+            else:
+                owner = piece.get_player()
+                grids[owner, sq] = 1
+                grids[1 - owner, sq] = 2
+
+    def __piece_moves(self, piece: Piece) -> int:
+        position = self.__position
+        player = piece.get_player()
+        friends = position.occupancy[player]
+        enemies = position.occupancy[1 - player]
+
+        if piece.KIND == PAWN:
+            return piece.moves(friends, enemies, position.en_passant)
+        if piece.KIND == KING:
+            return piece.moves(friends, enemies, position.rock_towers(player))
+
+        return piece.moves(friends, enemies)
+
+    def __encode(self, piece: Piece, to: int, promotion: int) -> int:
+        _from = piece.get_square()
+        flag = NORMAL
+
+        if piece.KIND == PAWN:
+            if to == self.__position.en_passant:
+                flag = EN_PASSANT
+            elif abs(to - _from) == 16:
+                flag = DOUBLE_PUSH
+            elif to >> 3 in (0, 7):
+                flag = promotion_flag(promotion)
+
+        elif piece.KIND == KING and abs(to - _from) == 2:
+            flag = ROCK
+
+        return encode(_from, to, flag)
@@ -0,0 +1,139 @@
+"""FEN (Forsyth-Edwards Notation) module
+"""
+from app.model.bitboard import KING, PAWN, coordinates, parse_square, popcount, square_name
+from app.model.pieces import *
+from app.model.pieces.piece import UNMOVED
+from app.model.position import Position
+from app.model.zobrist import rock_rights
+from app.utils.exceptions import InvalidFenException
+
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+PIECE_LETTERS = {"p": Pawn, "n": Horse, "b": Bishop, "r": Tower, "q": Queen, "k": King}
+KIND_LETTERS = "pnbrqk" # Indexed by piece kind
+
+# Squares that must never have moved for each rock right (king and tower)
+ROCK_SQUARES = {"K": (60, 63), "Q": (60, 56), "k": (4, 7), "q": (4, 0)}
+
+
+def parse_fen(fen: str) -> Position:
+    """
+        Builds a position from a FEN string.
+
+        params:
+            fen: The FEN string. The move counters are optional.
+
+        return: A Position object.
+    """
+    fields = fen.split()
+    if len(fields) < 4:
+        raise InvalidFenException(f"Invalid FEN: {fen}")
+
+    placement, turn, rocks, en_passant = fields[:4]
+    position = Position()
+
+    rows = placement.split("/")
+    if len(rows) != 8:
+        raise InvalidFenException(f"Invalid FEN placement: {placement}")
+
+    for row, content in enumerate(rows):
+        col = 0
+        for char in content:
+            if char.isdigit():
+                col += int(char)
+                continue
+
+            if char.lower() not in PIECE_LETTERS or col > 7:
+                raise InvalidFenException(f"Invalid FEN placement: {placement}")
+
+            player = 0 if char.isupper() else 1
+            sq = row * 8 + col
+            position.put(PIECE_LETTERS[char.lower()](coordinates(sq), player))
+            col += 1
+
+        if col != 8:
+            raise InvalidFenException(f"Invalid FEN placement: {placement}")
+
+    if any(popcount(position.bitboards[player][KING]) != 1 for player in range(2)):
+        raise InvalidFenException(f"Each player must have one king: {placement}")
+
+    if turn not in ("w", "b"):
+        raise InvalidFenException(f"Invalid FEN turn: {turn}")
+    position.turn = 0 if turn == "w" else 1
+
+    position.unmoved = 0
+    for right in rocks.replace("-", ""):
+        if right not in ROCK_SQUARES:
+            raise InvalidFenException(f"Invalid FEN rock rights: {rocks}")
+        for sq in ROCK_SQUARES[right]:
+            position.unmoved |= 1 << sq
+    for pieces in position.pieces: # The pieces flags follow the rock rights
+        for piece in pieces:
+            if not position.unmoved >> piece.get_square() & 1:
+                piece._flags &= ~UNMOVED
+
+    if en_passant != "-":
+        try:
+            position.en_passant = parse_square(en_passant)
+        except ValueError:
+            raise InvalidFenException(f"Invalid FEN en passant square: {en_passant}")
+
+        # The enemy pawn just double pushed past the square: it's on the 6th (3rd) rank, empty, and so is the pawn origin
+        step = 8 if position.turn == 0 else -8
+        sq = position.en_passant
+        if (
+            sq // 8 != (2 if position.turn == 0 else 5)
+            or not position.bitboards[1 - position.turn][PAWN] >> (sq + step) & 1
+            or position.mailbox[sq] is not None
+            or position.mailbox[sq - step] is not None
+        ):
+            raise InvalidFenException(f"Impossible FEN en passant square: {en_passant}")
+
+    try:
+        position.halfmove = int(fields[4]) if len(fields) > 4 else 0
+        position.fullmove = int(fields[5]) if len(fields) > 5 else 1
+    except ValueError:
+        raise InvalidFenException(f"Invalid FEN move counters: {' '.join(fields[4:])}")
+
+    position.rehash()
+
+    return position
+
+
+def to_fen(position: Position) -> str:
+    """
+        Describes a position as a FEN string.
+
+        params:
+            position: The Position object.
+
+        return: The FEN string, move counters included.
+    """
+    rows = list()
+
+    for row in range(8):
+        content = ""
+        empty = 0
+
+        for piece in position.mailbox[row * 8: row * 8 + 8]:
+            if piece is None:
+                empty += 1
+                continue
+
+            if empty:
+                content += str(empty)
+                empty = 0
+
+            letter = KIND_LETTERS[piece.KIND]
+            content += letter.upper() if piece.get_player() == 0 else letter
+
+        rows.append(content + (str(empty) if empty else ""))
+
+    rights = rock_rights(position.unmoved)
+    rocks = "".join(right for i, right in enumerate("KQkq") if rights >> i & 1) or "-"
+    en_passant = square_name(position.en_passant) if position.en_passant is not None else "-"
+
+    return " ".join([
+        "/".join(rows), "wb"[position.turn], rocks, en_passant, str(position.halfmove), str(position.fullmove)
+    ])
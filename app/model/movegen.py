@@ -0,0 +1,142 @@
+"""Legal move generation module
+"""
+from app.model.attacks import (
+    BETWEEN, KING_ATTACKS, LINE, PAWN_ATTACKS, bishop_attacks, tower_attacks
+)
+from app.model.bitboard import BISHOP, EMPTY, FULL, PAWN, QUEEN, TOWER, lsb, squares
+from app.model.moves import DOUBLE_PUSH, EN_PASSANT, PROMOTION, ROCK
+from app.model.position import Position
+
+
+def pinned_pieces(position: Position, player: int) -> dict:
+    """
+        Finds the player's pieces pinned against their own king.
+
+        params:
+            position: The Position object.
+            player: The player owning the king.
+
+        return: A dict mapping each pinned piece square to the line it can
+        still move along.
+    """
+    king = position.king_square(player)
+    enemy = position.bitboards[1 - player]
+    occupied = position.occupied
+    friends = position.occupancy[player]
+
+    snipers = (tower_attacks(king, EMPTY) & (enemy[TOWER] | enemy[QUEEN])) |\
+        (bishop_attacks(king, EMPTY) & (enemy[BISHOP] | enemy[QUEEN]))
+
+    pinned = dict()
+    for sniper in squares(snipers):
+        blockers = BETWEEN[king][sniper] & occupied
+        if blockers and not blockers & (blockers - 1) and blockers & friends:
+            pinned[lsb(blockers)] = LINE[king][sniper]
+
+    return pinned
+
+
+def legal_moves(position: Position, player: int = None) -> list:
+    """
+        Generates every legal move of a player, computing checks and pins up
+        front instead of trying the moves.
+
+        params:
+            position: The Position object.
+            player: The player to move (defaults to the position's turn).
+
+        return: A list of packed moves (see app.model.moves).
+    """
+    if player is None:
+        player = position.turn
+
+    enemy = 1 - player
+    mailbox = position.mailbox
+    friends = position.occupancy[player]
+    enemies = position.occupancy[enemy]
+    occupied = position.occupied
+    king = position.king_square(player)
+    last_row = 0 if player == 0 else 7
+    moves = list()
+
+    # The king can't step into any square attacked once it has left its own
+    without_king = occupied ^ (1 << king)
+    for to in squares(KING_ATTACKS[king] & ~friends):
+        if not position.is_square_attacked(to, enemy, without_king):
+            moves.append(king | (to << 6))
+
+    checkers = position.attackers(king, enemy)
+    if checkers & (checkers - 1): # Double xeque: only the king can move
+        return moves
+
+    if checkers:
+        targets = checkers | BETWEEN[king][lsb(checkers)]
+    else:
+        targets = FULL
+        attacked = position.attack_map(enemy)
+
+        for tower in squares(position.rock_towers(player)): # Rock
+            step = 1 if tower > king else -1
+            path = (1 << (king + step)) | (1 << (king + 2 * step))
+            if not BETWEEN[king][tower] & occupied and not path & attacked:
+                moves.append(king | ((king + 2 * step) << 6) | (ROCK << 12))
+
+    pinned = pinned_pieces(position, player)
+
+    for sq in squares(friends ^ (1 << king)):
+        piece = mailbox[sq]
+        destinations = piece.moves(friends, enemies) & targets
+        if sq in pinned:
+            destinations &= pinned[sq]
+
+        if piece.KIND != PAWN:
+            for to in squares(destinations):
+                moves.append(sq | (to << 6))
+            continue
+
+        for to in squares(destinations):
+            if to >> 3 == last_row:
+                for flag in range(PROMOTION, PROMOTION + 4):
+                    moves.append(sq | (to << 6) | (flag << 12))
+            elif abs(to - sq) == 16:
+                moves.append(sq | (to << 6) | (DOUBLE_PUSH << 12))
+            else:
+                moves.append(sq | (to << 6))
+
+    # En passant is rare enough to be verified by playing it
+    en_passant = position.en_passant
+    if en_passant is not None and player == position.turn:
+        for sq in squares(PAWN_ATTACKS[enemy][en_passant] & position.bitboards[player][PAWN]):
+            move = sq | (en_passant << 6) | (EN_PASSANT << 12)
+            token = position.make_move(move)
+            if not position.is_square_attacked(king, enemy):
+                moves.append(move)
+            position.unmake_move(token)
+
+    return moves
+
+
+def perft(position: Position, depth: int) -> int:
+    """
+        Counts the leaf nodes of the legal move tree (performance test).
+
+        params:
+            position: The Position object.
+            depth: The tree depth in plies.
+
+        return: The number of leaf nodes.
+    """
+    if depth == 0:
+        return 1
+
+    moves = legal_moves(position)
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        token = position.make_move(move)
+        nodes += perft(position, depth - 1)
+        position.unmake_move(token)
+
+    return nodes
@@ -0,0 +1,102 @@
+"""Move encoding module.
+
+A move is packed in a 16 bits int: the origin square in the bits 0 to 5, the
+destination square in the bits 6 to 11 and a flag in the bits 12 to 15.
+"""
+from app.model.bitboard import BISHOP, HORSE, QUEEN, TOWER, parse_square, square_name
+from app.utils.special_plays import SpecialPlays
+
+
+NORMAL = 0
+DOUBLE_PUSH = 1
+EN_PASSANT = 2
+ROCK = 3
+PROMOTION = 4 # Promotion flags are PROMOTION + (kind - HORSE)
+
+PROMOTION_KINDS = (HORSE, BISHOP, TOWER, QUEEN)
+PROMOTION_LETTERS = {HORSE: "n", BISHOP: "b", TOWER: "r", QUEEN: "q"}
+
+
+def encode(_from: int, to: int, flag: int = NORMAL) -> int:
+    """
+        Packs a move.
+
+        params:
+            _from: The origin square.
+            to: The destination square.
+            flag: One of the move flags (NORMAL, DOUBLE_PUSH, EN_PASSANT,
+            ROCK) or a promotion flag (see promotion_flag).
+
+        return: The packed move.
+    """
+    return _from | (to << 6) | (flag << 12)
+
+
+def origin(move: int) -> int:
+    """Returns the origin square of a packed move."""
+    return move & 63
+
+
+def destination(move: int) -> int:
+    """Returns the destination square of a packed move."""
+    return (move >> 6) & 63
+
+
+def flag(move: int) -> int:
+    """Returns the flag of a packed move."""
+    return move >> 12
+
+
+def promotion_flag(kind: int = QUEEN) -> int:
+    """Returns the flag of a promotion to the given piece kind."""
+    return PROMOTION + kind - HORSE
+
+
+def promotion_kind(move: int) -> int:
+    """Returns the piece kind a packed move promotes to (None if it doesn't)."""
+    if move >> 12 >= PROMOTION:
+        return (move >> 12) - PROMOTION + HORSE
+
+
+def special_play(move: int) -> SpecialPlays:
+    """Returns the SpecialPlays member of a packed move (None for regular moves)."""
+    move_flag = move >> 12
+
+    if move_flag == EN_PASSANT:
+        return SpecialPlays.EN_PASSANT
+    if move_flag == ROCK:
+        return SpecialPlays.ROCK
+    if move_flag >= PROMOTION:
+        return SpecialPlays.END_OF_BOARD
+
+
+def move_name(move: int) -> str:
+    """Returns the coordinate notation of a packed move (e.g. 'e2e4', 'a7a8q')."""
+    name = square_name(move & 63) + square_name((move >> 6) & 63)
+
+    if move >> 12 >= PROMOTION:
+        name += PROMOTION_LETTERS[promotion_kind(move)]
+
+    return name
+
+
+def parse_move_name(name: str) -> tuple:
+    """
+        Parses the coordinate notation of a move (e.g. 'e2e4', 'a7a8q').
+
+        params:
+            name: The move name.
+
+        return: A tuple with the origin square, the destination square and
+        the promotion piece kind (QUEEN if it isn't given).
+    """
+    if len(name) not in (4, 5):
+        raise ValueError(f"Invalid move: {name}")
+
+    kinds = {letter: kind for kind, letter in PROMOTION_LETTERS.items()}
+    if len(name) == 5 and name[4].lower() not in kinds:
+        raise ValueError(f"Invalid promotion: {name}")
+
+    kind = kinds[name[4].lower()] if len(name) == 5 else QUEEN
+
+    return parse_square(name[:2]), parse_square(name[2:4]), kind
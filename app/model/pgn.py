@@ -0,0 +1,173 @@
+"""PGN (Portable Game Notation) module
+
+Games are streamed: read_pgn holds a single game in memory at a time, so
+archives of any size are read in constant memory.
+"""
+import re
+from typing import NamedTuple
+
+from app.model.fen import START_FEN, parse_fen
+from app.model.san import move_to_san, parse_san
+from app.utils.exceptions import InvalidPgnException
+
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+SEVEN_TAGS = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+LINE_WIDTH = 80
+
+TAG_PATTERN = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]\s*$')
+TOKEN_PATTERN = re.compile(r"\{[^}]*\}?|;[^\n]*|[()]|\$\d+|\d+\.+|[^\s(){};$]+")
+
+
+class GameRecord(NamedTuple):
+    tags: dict
+    moves: list # Packed moves if decoded, else SAN strings
+    result: str
+    error: str = None # Why decoding stopped before the end (None if it didn't)
+
+
+def read_pgn(file, decode: bool = True):
+    """
+        Reads the games of a PGN file lazily.
+
+        params:
+            file: A text file (or any iterable of lines).
+            decode: If it's True the SAN moves are decoded into packed moves
+            (see app.model.moves), stopping at the first illegal one.
+
+        return: A generator of GameRecord objects.
+    """
+    for tags, movetext in _split_games(file):
+        sans, result = _parse_movetext(movetext)
+        result = result or tags.get("Result", "*")
+
+        if not decode:
+            yield GameRecord(tags, sans, result)
+            continue
+
+        moves = list()
+        error = None
+        try:
+            position = parse_fen(tags.get("FEN", START_FEN))
+            for san in sans:
+                move = parse_san(position, san)
+                position.make_move(move)
+                moves.append(move)
+        except Exception as e:
+            error = f"ply {len(moves) + 1}: {e}"
+
+        yield GameRecord(tags, moves, result, error)
+
+
+def _split_games(lines):
+    tags = dict()
+    movetext = list()
+    comment = False # Inside a multiple lines {} comment
+
+    for line in lines:
+        if not comment:
+            if line.startswith("%"): # Escaped line
+                continue
+
+            match = TAG_PATTERN.match(line.strip())
+            if match:
+                if movetext:
+                    yield tags, "".join(movetext)
+                    tags = dict()
+                    movetext = list()
+                tags[match.group(1)] = match.group(2).replace('\\"', '"').replace("\\\\", "\\")
+                continue
+
+        if line.strip():
+            movetext.append(line if line.endswith("\n") else line + "\n")
+            comment = line.rfind("{") > line.rfind("}") or (comment and "}" not in line)
+
+    if tags or movetext:
+        yield tags, "".join(movetext)
+
+
+def _parse_movetext(movetext: str) -> tuple:
+    sans = list()
+    result = None
+    variations = 0
+
+    for token in TOKEN_PATTERN.findall(movetext):
+        if token == "(":
+            variations += 1
+        elif token == ")":
+            variations = max(variations - 1, 0)
+        elif variations or token[0] in "{;$" or token[0].isdigit() and token.endswith("."):
+            continue
+        elif token in RESULTS:
+            result = token
+        else:
+            sans.append(token)
+
+    return sans, result
+
+
+def game_to_pgn(moves: list, tags: dict = None, result: str = "*", fen: str = None) -> str:
+    """
+        Writes a game in PGN.
+
+        params:
+            moves: The packed moves of the game.
+            tags: The tag pairs. The seven tag roster is always written first,
+            '?' filling the missing tags.
+            result: The game result ('1-0', '0-1', '1/2-1/2' or '*').
+            fen: The starting position (None for the standard one).
+
+        return: The PGN text of the game, ending with a blank line.
+    """
+    if result not in RESULTS:
+        raise InvalidPgnException(f"Invalid PGN result: {result}")
+
+    tags = dict(tags or dict())
+    tags["Result"] = result
+    if fen is not None:
+        tags["SetUp"] = "1"
+        tags["FEN"] = fen
+
+    names = [name for name in SEVEN_TAGS] + [name for name in tags if name not in SEVEN_TAGS]
+    lines = [
+        '[{} "{}"]'.format(name, tags.get(name, "?").replace("\\", "\\\\").replace('"', '\\"')) for name in names
+    ]
+
+    position = parse_fen(fen or START_FEN)
+    tokens = list()
+    for i, move in enumerate(moves):
+        if position.turn == 0:
+            tokens.append(f"{position.fullmove}.")
+        elif i == 0:
+            tokens.append(f"{position.fullmove}...")
+
+        tokens.append(move_to_san(position, move))
+        position.make_move(move)
+
+    tokens.append(result)
+
+    line = ""
+    movetext = list()
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_WIDTH:
+            movetext.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    movetext.append(line)
+
+    return "\n".join(lines) + "\n\n" + "\n".join(movetext) + "\n\n"
+
+
+def write_pgn(file, moves: list, tags: dict = None, result: str = "*", fen: str = None) -> None:
+    """
+        Appends a game to a PGN file (see game_to_pgn).
+
+        params:
+            file: A writable text file.
+            moves: The packed moves of the game.
+            tags: The tag pairs.
+            result: The game result.
+            fen: The starting position (None for the standard one).
+    """
+    file.write(game_to_pgn(moves, tags, result, fen))
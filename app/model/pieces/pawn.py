@@ -2,73 +2,41 @@
 """
 import numpy as np
 
+from app.model.attacks import PAWN_ATTACKS, PAWN_PUSHES
+from app.model.bitboard import PAWN, lsb, square
 from app.model.pieces.piece import Piece
-from app.utils.special_plays import SpecialPlays
 
 
 class Pawn(Piece):
+    KIND = PAWN
+    __slots__ = ()
+
     def __init__(self, coordinates: tuple, player: int) -> None:
         """Pawn piece class"""
         super().__init__(coordinates, player)
-
-        self.__first_move = True
     
-    def possible_moveset(self, chess_table, last_move: tuple = None):
-        moves = list()
+    def moves(self, friends: int, enemies: int, en_passant: int = None) -> int:
+        player = self.get_player()
+        empty = ~(friends | enemies)
 
-        def __add_move(loc: tuple, cond: any):
-            if cond(loc):
-                moves.append(loc)
+        moves = PAWN_PUSHES[player][self._square] & empty # Forward move
+        if moves and self._square >> 3 == 6 - 5 * player: # First move
+            moves |= PAWN_PUSHES[player][lsb(moves)] & empty
 
-        if self.__first_move: # First move
-            condition = lambda x: chess_table[x[0], x[1]] == 0 and\
-                        chess_table[x[0] + 1, x[1]] == 0
-            move = self.get_coordinates() + (-2, 0)
-            __add_move(move, condition)
-        
-        if self.get_coordinates()[0] == 3 and last_move is not None: # En passant
-            condition = lambda x: x[1] >= 0 and x[1] <= 7 and\
-                        chess_table[x[0], x[1]] == 0 and\
-                        chess_table[x[0] + 1, x[1]] == 2 and\
-                        (x[0] + 1) == last_move[0] and x[1] == last_move[1]                
-            move = self.get_coordinates() + (-1, -1)
-            __add_move(move, condition)
-            move = self.get_coordinates() + (-1, 1)
-            __add_move(move, condition)
+        moves |= PAWN_ATTACKS[player][self._square] & enemies # Capture move
 
-        # Forward move
-        condition = lambda x: chess_table[x[0], x[1]] == 0
-        move = self.get_coordinates() + (-1, 0)
-        __add_move(move, condition)
-        
-        # Capture move
-        condition = lambda x: x[1] >= 0 and x[1] <= 7 and chess_table[x[0], x[1]] == 2
-        move = self.get_coordinates() + (-1, -1)
-        __add_move(move, condition)
-        move = self.get_coordinates() + (-1, +1)
-        __add_move(move, condition)
+        if en_passant is not None: # En passant
+            moves |= PAWN_ATTACKS[player][self._square] & (1 << en_passant)
 
-        return np.array(moves, dtype=int)
-    
-    def move(self, dest: tuple, chess_table: np.ndarray, last_move: tuple):
-        """
-            Verifies if the destination is a valid movement and
-            moves this piece to it if possible.
-
-            params:
-                dest: A tuple with destination coordinates.
+        return moves
 
-            return: None.
-        """
-        init = self.get_coordinates()
+    def possible_moveset(self, chess_table, last_move: tuple = None):
+        return super().possible_moveset(chess_table, last_move=last_move)
 
-        super()._move(dest, chess_table, last_move=last_move)
-        self.__first_move = False
+    def _table_moves(self, chess_table: np.ndarray, last_move: tuple = None) -> int:
+        en_passant = None
+        if last_move is not None: # The pawn that can be captured en passant
+            pushes = PAWN_PUSHES[self.get_player()]
+            en_passant = lsb(pushes[square(last_move)])
 
-        if abs(init[1] - dest[1]) == 1 and\
-            chess_table[dest[0], dest[1]] == 0 and\
-            chess_table[dest[0] + 1, dest[1]] == 2:
-            return SpecialPlays.EN_PASSANT
-            
-        if dest[0] == 0:
-            return SpecialPlays.END_OF_BOARD
+        return super()._table_moves(chess_table, en_passant=en_passant)
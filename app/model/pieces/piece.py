@@ -2,63 +2,87 @@
 """
 import numpy as np
 
+from app.model.bitboard import coordinates as to_coordinates, from_array, square, squares
 from app.utils.exceptions import *
 
 
+# Piece flags
+SECOND_PLAYER = 1
+ALIVE = 2
+UNMOVED = 4
+
+
 class Piece:
+    KIND = None
+    __slots__ = ("_square", "_flags") # The square (0 to 63) and the piece flags
+
     def __init__(self, coordinates: tuple, player: int):
         """Standart piece class"""
         if player not in [0, 1]:
             raise InvalidPlayerException("The player num must be 0 or 1")
         
-        self.__player = player
-        self.__coordinates = np.array(coordinates, dtype=int)
-        self.__isalive = True
+        self._square = square(coordinates)
+        self._flags = player | ALIVE | UNMOVED
 
     def isalive(self) -> bool:
         """Checks if this piece is still in the game."""
-        return self.__isalive
+        return self._flags & ALIVE != 0
+
+    def isunmoved(self) -> bool:
+        """Checks if this piece hasn't moved yet (its first move is still to come)."""
+        return self._flags & UNMOVED != 0
     
-    def get_coordinates(self, turned: bool = False) -> np.ndarray:
+    def get_coordinates(self, turned: bool = False) -> tuple:
         """
             Returns the current piece coordinate.
 
             params:
-                turned: If it's True gets the coordinate turning the table (for
-                player 2 movements).
+                turned: If it's True gets the coordinate turning the table (the
+                second player's point of view, for display).
             
-            return: A numpy ndarray with the current coordinate of the piece.
+            return: A (row, column) tuple with the current coordinate of the piece.
         """
-        return self.__coordinates if not turned else np.array([7, 7], dtype=int) - self.__coordinates
+        return to_coordinates(self._square, turned)
+
+    def get_square(self) -> int:
+        """Returns the current piece square index (first player's point of view)."""
+        return self._square
     
     def got_captured(self):
-        self.__isalive = False
+        self._flags &= ~ALIVE
 
-    def possible_moveset(self, chess_table: np.ndarray) -> np.ndarray:
+    def moves(self, friends: int, enemies: int) -> int:
         """
-            Calculates all possible moves for this piece.
+            Calculates all possible moves for this piece using bitboards.
 
             params:
-                chess_table: A (8, 8) shaped numpy ndarray containing all
-                friend and enemy pieces location (0 for unoccupied, 1 for
-                friend and 2 for enemy).
+                friends: A bitboard with the friendly pieces locations.
+                enemies: A bitboard with the enemy pieces locations.
 
-            return: A numpy array with all possible moves.
+            return: A bitboard with all possible destination squares.
         """
         # Implement this in the subclasses
         pass
-    
-    def _move(self, dest: np.ndarray, chess_table: np.ndarray, **kwargs) -> None:
-        if 2 not in np.sum(self.possible_moveset(chess_table, **kwargs) == dest, axis=1):
-            raise ImpossibleMoveException(f"Cannot move this piece to pos {[dest[0], dest[1]]}.")
 
-        if not isinstance(dest, np.ndarray):
-            dest = np.array(dest, dtype=int)
+    def possible_moveset(self, chess_table: np.ndarray, **kwargs) -> list:
+        """
+            Calculates all possible moves for this piece.
 
-        self.__coordinates = dest
+            params:
+                chess_table: A (8, 8) shaped numpy ndarray containing all
+                friend and enemy pieces location (0 for unoccupied, 1 for
+                friend and 2 for enemy).
+
+            return: A list with the (row, column) coordinates of all possible
+            moves.
+        """
+        moves = self._table_moves(chess_table, **kwargs)
 
-    def _special_move(self, to:np.ndarray) -> None:
-        self.__coordinates = to
+        return [to_coordinates(sq) for sq in squares(moves)]
 
+    def _table_moves(self, chess_table: np.ndarray, **kwargs) -> int:
+        """Packs a friends and enemies table into bitboards and calls moves."""
+        return self.moves(from_array(chess_table == 1), from_array(chess_table == 2), **kwargs)
+    
     def get_player(self) -> int:
-        return self.__player
+        return self._flags & SECOND_PLAYER
@@ -0,0 +1,311 @@
+"""Bitboard position module
+"""
+from app.model.attacks import (
+    HORSE_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, PAWN_PUSHES, bishop_attacks, tower_attacks
+)
+from app.model.bitboard import BISHOP, EMPTY, HORSE, KING, PAWN, QUEEN, TOWER, coordinates, lsb, squares
+from app.model.moves import DOUBLE_PUSH, EN_PASSANT, PROMOTION, ROCK, promotion_kind
+from app.model.pieces import Bishop, Horse, Queen, Tower
+from app.model.pieces.piece import ALIVE, UNMOVED, Piece
+from app.model.zobrist import (
+    PIECE_KEYS, ROCK_KEYS, ROCK_SQUARES, TURN_KEY, compute_key, en_passant_key, rock_rights
+)
+
+
+PROMOTED_PIECES = {HORSE: Horse, BISHOP: Bishop, TOWER: Tower, QUEEN: Queen}
+
+
+class Position:
+    def __init__(self):
+        """
+            Bitboard based position core.
+
+            Holds one bitboard for each player and piece kind, the occupancy
+            masks of both players and a 64 squares mailbox pointing to the
+            Piece objects, so every square lookup runs in constant time. The
+            Piece objects are handles over this core: their squares are kept
+            up to date by it.
+        """
+        self.bitboards = [[EMPTY] * 6 for _ in range(2)]
+        self.occupancy = [EMPTY, EMPTY]
+        self.occupied = EMPTY
+        self.unmoved = EMPTY
+        self.en_passant = None
+        self.turn = 0
+        self.halfmove = 0 # Plies since the last capture or pawn move
+        self.fullmove = 1 # Starts at 1, incremented after the second player moves
+        self.key = 0
+        self.attack_maps = [None, None]
+        self.mailbox = [None] * 64
+        self.pieces = [list(), list()]
+
+    def put(self, piece: Piece) -> None:
+        """
+            Places a new piece on the board.
+
+            params:
+                piece: The Piece object, already holding its square.
+        """
+        sq = piece.get_square()
+        player = piece.get_player()
+        bit = 1 << sq
+
+        self.bitboards[player][piece.KIND] |= bit
+        self.occupancy[player] |= bit
+        self.occupied |= bit
+        self.unmoved |= bit
+        self.mailbox[sq] = piece
+        self.pieces[player].append(piece)
+
+    def rehash(self) -> None:
+        """Recomputes the Zobrist key from scratch (after setting up a position)."""
+        self.key = compute_key(self.bitboards, self.turn, self.unmoved, self.en_passant)
+
+    def make_move(self, move: int) -> tuple:
+        """
+            Plays a packed move (see app.model.moves) without validating it.
+
+            params:
+                move: The packed move.
+
+            return: An undo token to be given to unmake_move.
+        """
+        _from = move & 63
+        to = (move >> 6) & 63
+        move_flag = move >> 12
+
+        mailbox = self.mailbox
+        piece = mailbox[_from]
+        player = piece.get_player()
+        enemy = 1 - player
+        bitboards = self.bitboards[player]
+        occupancy = self.occupancy
+        keys = PIECE_KEYS[player]
+
+        key = self.key ^ TURN_KEY ^ keys[piece.KIND][_from] ^ keys[piece.KIND][to]
+        if self.en_passant is not None:
+            key ^= en_passant_key(self.bitboards, self.en_passant, self.turn)
+
+        captured_square = PAWN_PUSHES[enemy][to].bit_length() - 1 if move_flag == EN_PASSANT else to
+        captured = mailbox[captured_square]
+        if captured is not None:
+            bit = 1 << captured_square
+            self.bitboards[enemy][captured.KIND] ^= bit
+            occupancy[enemy] ^= bit
+            mailbox[captured_square] = None
+            captured._flags &= ~ALIVE
+            key ^= PIECE_KEYS[enemy][captured.KIND][captured_square]
+
+        swap = (1 << _from) | (1 << to)
+        bitboards[piece.KIND] ^= swap
+        occupancy[player] ^= swap
+        mailbox[_from] = None
+        mailbox[to] = piece
+        piece._square = to
+        piece._flags &= ~UNMOVED
+
+        promoted = None
+        if move_flag == ROCK:
+            tower_from, tower_to = (to + 1, to - 1) if to > _from else (to - 2, to + 1)
+            tower = mailbox[tower_from]
+            tower_swap = (1 << tower_from) | (1 << tower_to)
+            bitboards[TOWER] ^= tower_swap
+            occupancy[player] ^= tower_swap
+            mailbox[tower_from] = None
+            mailbox[tower_to] = tower
+            tower._square = tower_to
+            tower._flags &= ~UNMOVED
+            key ^= keys[TOWER][tower_from] ^ keys[TOWER][tower_to]
+
+        elif move_flag >= PROMOTION:
+            kind = promotion_kind(move)
+            promoted = PROMOTED_PIECES[kind](coordinates(to), player)
+            promoted._flags &= ~UNMOVED
+            bitboards[PAWN] ^= 1 << to
+            bitboards[kind] ^= 1 << to
+            mailbox[to] = promoted
+            pieces = self.pieces[player]
+            pieces[pieces.index(piece)] = promoted
+            key ^= keys[PAWN][to] ^ keys[kind][to]
+
+        token = (
+            move, piece, captured, promoted, self.en_passant, self.unmoved, self.turn, self.key, self.attack_maps,
+            self.halfmove
+        )
+
+        touched = swap | (1 << captured_square)
+        if touched & ROCK_SQUARES & self.unmoved:
+            key ^= ROCK_KEYS[rock_rights(self.unmoved)] ^ ROCK_KEYS[rock_rights(self.unmoved & ~touched)]
+        self.unmoved &= ~touched
+
+        self.en_passant = None
+        if move_flag == DOUBLE_PUSH:
+            self.en_passant = (_from + to) >> 1
+            key ^= en_passant_key(self.bitboards, self.en_passant, enemy)
+
+        self.occupied = occupancy[0] | occupancy[1]
+        self.halfmove = 0 if captured is not None or piece.KIND == PAWN else self.halfmove + 1
+        self.fullmove += player
+        self.turn = enemy
+        self.key = key
+        self.attack_maps = [None, None]
+
+        return token
+
+    def unmake_move(self, token: tuple) -> None:
+        """
+            Takes back a move played by make_move.
+
+            params:
+                token: The undo token returned by make_move.
+        """
+        move, piece, captured, promoted, en_passant, unmoved, turn, key, attack_maps, halfmove = token
+        _from = move & 63
+        to = (move >> 6) & 63
+        move_flag = move >> 12
+
+        mailbox = self.mailbox
+        player = piece.get_player()
+        enemy = 1 - player
+        bitboards = self.bitboards[player]
+        occupancy = self.occupancy
+
+        if promoted is not None:
+            bitboards[promoted.KIND] ^= 1 << to
+            bitboards[PAWN] ^= 1 << to
+            pieces = self.pieces[player]
+            pieces[pieces.index(promoted)] = piece
+
+        elif move_flag == ROCK:
+            tower_from, tower_to = (to + 1, to - 1) if to > _from else (to - 2, to + 1)
+            tower = mailbox[tower_to]
+            tower_swap = (1 << tower_from) | (1 << tower_to)
+            bitboards[TOWER] ^= tower_swap
+            occupancy[player] ^= tower_swap
+            mailbox[tower_to] = None
+            mailbox[tower_from] = tower
+            tower._square = tower_from
+            if unmoved >> tower_from & 1:
+                tower._flags |= UNMOVED
+
+        swap = (1 << _from) | (1 << to)
+        bitboards[piece.KIND] ^= swap
+        occupancy[player] ^= swap
+        mailbox[to] = None
+        mailbox[_from] = piece
+        piece._square = _from
+        if unmoved >> _from & 1:
+            piece._flags |= UNMOVED
+
+        if captured is not None:
+            captured_square = captured._square
+            bit = 1 << captured_square
+            self.bitboards[enemy][captured.KIND] ^= bit
+            occupancy[enemy] ^= bit
+            mailbox[captured_square] = captured
+            captured._flags |= ALIVE
+
+        self.unmoved = unmoved
+        self.en_passant = en_passant
+        self.occupied = occupancy[0] | occupancy[1]
+        self.halfmove = halfmove
+        self.fullmove -= player
+        self.turn = turn
+        self.key = key
+        self.attack_maps = attack_maps
+
+    def attackers(self, sq: int, by_player: int, occupied: int = None) -> int:
+        """
+            Finds the pieces attacking a square, looking outward from it: slider
+            rays, horse jumps, pawn diagonals and king steps.
+
+            params:
+                sq: The attacked square.
+                by_player: The attacking player.
+                occupied: The occupancy blocking the sliders (defaults to the
+                current one).
+
+            return: A bitboard with the attacking pieces.
+        """
+        if occupied is None:
+            occupied = self.occupied
+
+        bitboards = self.bitboards[by_player]
+        queens = bitboards[QUEEN]
+
+        return (
+            (HORSE_ATTACKS[sq] & bitboards[HORSE])
+            | (PAWN_ATTACKS[1 - by_player][sq] & bitboards[PAWN])
+            | (KING_ATTACKS[sq] & bitboards[KING])
+            | (bishop_attacks(sq, occupied) & (bitboards[BISHOP] | queens))
+            | (tower_attacks(sq, occupied) & (bitboards[TOWER] | queens))
+        )
+
+    def is_square_attacked(self, sq: int, by_player: int, occupied: int = None) -> bool:
+        """
+            Checks if a square is attacked by a player, testing the cheapest
+            attackers first.
+
+            params:
+                sq: The square.
+                by_player: The attacking player.
+                occupied: The occupancy blocking the sliders (defaults to the
+                current one).
+
+            return: True if any piece of the player attacks the square.
+        """
+        if occupied is None:
+            occupied = self.occupied
+
+        bitboards = self.bitboards[by_player]
+
+        if HORSE_ATTACKS[sq] & bitboards[HORSE] or PAWN_ATTACKS[1 - by_player][sq] & bitboards[PAWN]:
+            return True
+        if KING_ATTACKS[sq] & bitboards[KING]:
+            return True
+        if bishop_attacks(sq, occupied) & (bitboards[BISHOP] | bitboards[QUEEN]):
+            return True
+
+        return bool(tower_attacks(sq, occupied) & (bitboards[TOWER] | bitboards[QUEEN]))
+
+    def attack_map(self, player: int) -> int:
+        """
+            Returns a bitboard with every square attacked by a player.
+
+            The map is computed once per position: make_move clears it and
+            unmake_move brings back the map of the previous position.
+        """
+        attacks = self.attack_maps[player]
+
+        if attacks is None:
+            bitboards = self.bitboards[player]
+            occupied = self.occupied
+            attacks = KING_ATTACKS[lsb(bitboards[KING])] if bitboards[KING] else EMPTY
+
+            for sq in squares(bitboards[PAWN]):
+                attacks |= PAWN_ATTACKS[player][sq]
+            for sq in squares(bitboards[HORSE]):
+                attacks |= HORSE_ATTACKS[sq]
+            for sq in squares(bitboards[BISHOP] | bitboards[QUEEN]):
+                attacks |= bishop_attacks(sq, occupied)
+            for sq in squares(bitboards[TOWER] | bitboards[QUEEN]):
+                attacks |= tower_attacks(sq, occupied)
+
+            self.attack_maps[player] = attacks
+
+        return attacks
+
+    def piece_at(self, sq: int) -> Piece:
+        """Returns the piece located at a square (None if it's empty)."""
+        return self.mailbox[sq]
+
+    def king_square(self, player: int) -> int:
+        """Returns the square of a player's king."""
+        return lsb(self.bitboards[player][KING])
+
+    def rock_towers(self, player: int) -> int:
+        """Returns a bitboard with the towers a player can still rock with."""
+        if not self.bitboards[player][KING] & self.unmoved:
+            return EMPTY
+
+        return self.bitboards[player][TOWER] & self.unmoved
@@ -0,0 +1,119 @@
+"""SAN (Standard Algebraic Notation) module
+"""
+import re
+
+from app.model.bitboard import PAWN, parse_square, square_name
+from app.model.movegen import legal_moves
+from app.model.moves import EN_PASSANT, PROMOTION, PROMOTION_LETTERS, ROCK, promotion_kind
+from app.model.position import Position
+from app.utils.exceptions import InvalidSanException
+
+
+PIECE_LETTERS = "PNBRQK" # Indexed by piece kind
+
+SAN_PATTERN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$")
+
+
+def move_to_san(position: Position, move: int, moves: list = None) -> str:
+    """
+        Writes a legal move in SAN (e.g. 'Nf3', 'exd5', 'O-O', 'e8=Q+').
+
+        params:
+            position: The Position object, with the move's player to move.
+            move: The packed move.
+            moves: The legal moves of the position (generated if not given).
+
+        return: The SAN string.
+    """
+    if moves is None:
+        moves = legal_moves(position)
+
+    _from = move & 63
+    to = (move >> 6) & 63
+    move_flag = move >> 12
+    mailbox = position.mailbox
+    kind = mailbox[_from].KIND
+
+    if move_flag == ROCK:
+        san = "O-O" if to > _from else "O-O-O"
+
+    else:
+        capture = mailbox[to] is not None or move_flag == EN_PASSANT
+
+        if kind == PAWN:
+            san = square_name(_from)[0] + "x" if capture else ""
+        else:
+            rivals = [
+                other & 63 for other in moves
+                if (other >> 6) & 63 == to and other & 63 != _from and mailbox[other & 63].KIND == kind
+            ]
+            san = PIECE_LETTERS[kind]
+            if rivals:
+                if all(sq & 7 != _from & 7 for sq in rivals):
+                    san += square_name(_from)[0]
+                elif all(sq >> 3 != _from >> 3 for sq in rivals):
+                    san += square_name(_from)[1]
+                else:
+                    san += square_name(_from)
+
+            if capture:
+                san += "x"
+
+        san += square_name(to)
+        if move_flag >= PROMOTION:
+            san += "=" + PROMOTION_LETTERS[promotion_kind(move)].upper()
+
+    token = position.make_move(move)
+    player = position.turn
+    if position.is_square_attacked(position.king_square(player), 1 - player):
+        san += "+" if legal_moves(position) else "#"
+    position.unmake_move(token)
+
+    return san
+
+
+def parse_san(position: Position, san: str, moves: list = None) -> int:
+    """
+        Finds the legal move described by a SAN string. Check and annotation
+        suffixes are ignored.
+
+        params:
+            position: The Position object, with the move's player to move.
+            san: The SAN string.
+            moves: The legal moves of the position (generated if not given).
+
+        return: The packed move.
+    """
+    if moves is None:
+        moves = legal_moves(position)
+
+    text = san.rstrip("+#!?")
+
+    if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        king_side = len(text) == 3
+        candidates = [move for move in moves if move >> 12 == ROCK and ((move >> 6) & 63 > move & 63) == king_side]
+
+    else:
+        match = SAN_PATTERN.match(text)
+        if match is None:
+            raise InvalidSanException(f"Invalid SAN move: {san}")
+
+        letter, file, rank, to, promotion = match.groups()
+        kind = PIECE_LETTERS.index(letter) if letter else PAWN
+        to = parse_square(to)
+        promotion = PIECE_LETTERS.index(promotion) if promotion else None
+        mailbox = position.mailbox
+
+        candidates = [
+            move for move in moves
+            if (move >> 6) & 63 == to and mailbox[move & 63].KIND == kind
+            and (file is None or "abcdefgh"[move & 7] == file)
+            and (rank is None or str(8 - ((move & 63) >> 3)) == rank)
+            and promotion_kind(move) == promotion
+        ]
+
+    if len(candidates) != 1:
+        reason = "Illegal" if not candidates else "Ambiguous"
+        raise InvalidSanException(f"{reason} SAN move: {san}")
+
+    return candidates[0]
@@ -0,0 +1,64 @@
+"""Zobrist hashing keys module.
+
+The keys come from a fixed seed so position hashes are stable between runs
+and processes (they are stored in books and indexes).
+"""
+from random import Random
+
+from app.model.attacks import PAWN_ATTACKS
+from app.model.bitboard import PAWN, squares
+
+
+_random = Random(0x5EED_C4E55)
+
+PIECE_KEYS = [[[_random.getrandbits(64) for _ in range(64)] for _ in range(6)] for _ in range(2)]
+TURN_KEY = _random.getrandbits(64)
+ROCK_KEYS = [_random.getrandbits(64) for _ in range(16)]
+EN_PASSANT_KEYS = [_random.getrandbits(64) for _ in range(8)]
+
+# Squares that must not have moved for each rock right: K, Q, k and q
+ROCK_MASKS = ((1 << 60) | (1 << 63), (1 << 60) | (1 << 56), (1 << 4) | (1 << 7), (1 << 4) | 1)
+ROCK_SQUARES = ROCK_MASKS[0] | ROCK_MASKS[1] | ROCK_MASKS[2] | ROCK_MASKS[3]
+
+
+def rock_rights(unmoved: int) -> int:
+    """Returns the rock rights (K, Q, k and q bits) of an unmoved squares mask."""
+    rights = 0
+
+    for i, mask in enumerate(ROCK_MASKS):
+        if unmoved & mask == mask:
+            rights |= 1 << i
+
+    return rights
+
+
+def en_passant_key(bitboards: list, en_passant: int, player: int) -> int:
+    """
+        Returns the en passant key of a position: it's only hashed when a pawn
+        of the player to move can actually capture.
+
+        params:
+            bitboards: The position bitboards.
+            en_passant: The en passant square (or None).
+            player: The player to move.
+
+        return: The key (0 if it isn't hashed).
+    """
+    if en_passant is not None and PAWN_ATTACKS[1 - player][en_passant] & bitboards[player][PAWN]:
+        return EN_PASSANT_KEYS[en_passant & 7]
+
+    return 0
+
+
+def compute_key(bitboards: list, turn: int, unmoved: int, en_passant: int) -> int:
+    """Computes a position key from scratch."""
+    key = TURN_KEY if turn == 1 else 0
+
+    for player in range(2):
+        for kind in range(6):
+            for sq in squares(bitboards[player][kind]):
+                key ^= PIECE_KEYS[player][kind][sq]
+
+    key ^= ROCK_KEYS[rock_rights(unmoved)]
+
+    return key ^ en_passant_key(bitboards, en_passant, turn)
@@ -0,0 +1 @@
+"""On-disk game and position storage module"""
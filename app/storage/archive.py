@@ -0,0 +1,289 @@
+"""Binary game archive module.
+
+File layout (little endian):
+
+    magic
+    game records, each one 2 bytes aligned:
+        header: plies (uint32), result code (uint8), padding, FEN length
+        (uint16), tags length (uint32)
+        the starting FEN (ASCII, empty for the standard start)
+        the tags ('name<TAB>value' lines, UTF-8)
+        padding to 2 bytes
+        one uint16 packed move per ply (see app.model.moves)
+    padding to 8 bytes
+    index: one uint64 record offset per game
+    footer: index offset (uint64), games count (uint64), magic
+
+The reader maps the file in memory: the index and the moves are memoryview
+slices of the map, so opening an archive or a game copies and parses nothing.
+
+usage: python -m app.storage.archive PGN ARCHIVE [--append]
+"""
+import argparse
+import mmap
+import struct
+import sys
+from typing import NamedTuple
+
+from app.model.chess_table import ChessTable
+from app.model.pgn import read_pgn
+
+
+MAGIC = b"CHESSGA1"
+GAME_HEADER = struct.Struct("<IBxHI")
+FOOTER = struct.Struct("<QQ8s")
+RESULTS = ("*", "1-0", "0-1", "1/2-1/2") # Indexed by result code
+EXTENSION = ".cga"
+
+if sys.byteorder != "little": # The memoryview casts use the native order
+    raise ImportError("The game archive requires a little endian machine.")
+
+
+class ArchivedGame(NamedTuple):
+    moves: memoryview # uint16 packed moves, a view over the archive map
+    result: str
+    fen: str # The starting position (None for the standard one)
+    tags: dict
+
+
+class ArchiveWriter:
+    def __init__(self, path: str, append: bool = False):
+        """
+            Writes a game archive. The index is written by close.
+
+            params:
+                path: The archive file path.
+                append: If it's True the games are added to an existing
+                archive, otherwise the file is overwritten.
+        """
+        self.__offsets = list()
+
+        if append:
+            self.__file = open(path, "r+b")
+            self.__file.seek(-FOOTER.size, 2)
+            index, count, magic = FOOTER.unpack(self.__file.read(FOOTER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} isn't a game archive.")
+
+            self.__file.seek(index)
+            self.__offsets = list(struct.unpack(f"<{count}Q", self.__file.read(8 * count)))
+            self.__file.seek(index)
+            self.__file.truncate()
+        else:
+            self.__file = open(path, "wb")
+            self.__file.write(MAGIC)
+
+        self.__position = self.__file.tell()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.__offsets)
+
+    def add(self, moves: list, result: str = "*", fen: str = None, tags: dict = None) -> int:
+        """
+            Appends a game.
+
+            params:
+                moves: The packed moves of the game.
+                result: The game result ('1-0', '0-1', '1/2-1/2' or '*').
+                fen: The starting position (None for the standard one).
+                tags: The game tag pairs (e.g. PGN tags).
+
+            return: The game number in the archive.
+        """
+        fen_data = (fen or "").encode("ascii")
+        tags_data = "".join(
+            f"{name}\t{' '.join(str(value).split())}\n" for name, value in (tags or dict()).items()
+        ).encode("utf-8")
+        padding = b"\0" * ((len(fen_data) + len(tags_data)) & 1)
+
+        record = b"".join([
+            GAME_HEADER.pack(len(moves), RESULTS.index(result), len(fen_data), len(tags_data)),
+            fen_data, tags_data, padding, struct.pack(f"<{len(moves)}H", *moves)
+        ])
+
+        self.__offsets.append(self.__position)
+        self.__file.write(record)
+        self.__position += len(record)
+
+        return len(self.__offsets) - 1
+
+    def record(self, table: ChessTable, result: str = None, tags: dict = None) -> int:
+        """
+            Appends the game played on a table through ChessTable.move (or
+            play_move).
+
+            params:
+                table: The ChessTable object.
+                result: The game result (found from the table if it's None:
+                '*' unless the game ended with a xeque mate or a stalemate).
+                tags: The game tag pairs.
+
+            return: The game number in the archive.
+        """
+        if result is None:
+            player = table.get_position().turn
+            if table.is_xeque_mate(player):
+                result = "0-1" if player == 0 else "1-0"
+            elif table.is_stalemate(player):
+                result = "1/2-1/2"
+            else:
+                result = "*"
+
+        return self.add(table.get_moves(), result, table.get_start_fen(), tags)
+
+    def close(self) -> None:
+        """Writes the index and the footer and closes the file."""
+        if self.__file.closed:
+            return
+
+        padding = -self.__position % 8
+        self.__file.write(b"\0" * padding)
+        index = self.__position + padding
+
+        self.__file.write(struct.pack(f"<{len(self.__offsets)}Q", *self.__offsets))
+        self.__file.write(FOOTER.pack(index, len(self.__offsets), MAGIC))
+        self.__file.close()
+
+
+class ArchiveReader:
+    def __init__(self, path: str):
+        """
+            Reads a game archive through a read only memory map.
+
+            The games hold views over the map: release them before closing
+            the reader.
+
+            params:
+                path: The archive file path.
+        """
+        with open(path, "rb") as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        index, count, magic = FOOTER.unpack_from(self.__map, len(self.__map) - FOOTER.size)
+        if magic != MAGIC or self.__map[:len(MAGIC)] != MAGIC:
+            self.__map.close()
+            raise ValueError(f"{path} isn't a game archive.")
+
+        self.__view = memoryview(self.__map)
+        self.__index = self.__view[index: index + 8 * count].cast("Q")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.__index)
+
+    def __getitem__(self, number: int) -> ArchivedGame:
+        offset = self.__index[number]
+        plies, result, fen_length, tags_length = GAME_HEADER.unpack_from(self.__map, offset)
+
+        offset += GAME_HEADER.size
+        fen = bytes(self.__view[offset: offset + fen_length]).decode("ascii") or None
+        offset += fen_length
+
+        tags = dict()
+        if tags_length:
+            for line in bytes(self.__view[offset: offset + tags_length]).decode("utf-8").splitlines():
+                name, _, value = line.partition("\t")
+                tags[name] = value
+        offset += tags_length + ((fen_length + tags_length) & 1)
+
+        return ArchivedGame(self.__view[offset: offset + 2 * plies].cast("H"), RESULTS[result], fen, tags)
+
+    def __iter__(self):
+        for number in range(len(self)):
+            yield self[number]
+
+    def moves(self, number: int) -> memoryview:
+        """Returns the packed moves of a game without reading its header strings."""
+        offset = self.__index[number]
+        plies, _, fen_length, tags_length = GAME_HEADER.unpack_from(self.__map, offset)
+        offset += GAME_HEADER.size + fen_length + tags_length + ((fen_length + tags_length) & 1)
+
+        return self.__view[offset: offset + 2 * plies].cast("H")
+
+    def replay(self, number: int, table: ChessTable = None, plies: int = None) -> ChessTable:
+        """
+            Replays a game into a table, without validating the moves.
+
+            params:
+                number: The game number.
+                table: The ChessTable object (a new one if it's None).
+                plies: How many moves to play (None for the whole game).
+
+            return: The ChessTable object.
+        """
+        game = self[number]
+        table = table if table is not None else ChessTable()
+
+        if game.fen is None:
+            table.reset_table()
+        else:
+            table.load_fen(game.fen)
+
+        moves = game.moves if plies is None else game.moves[:plies]
+        for move in moves:
+            table.make_move(move)
+        moves.release()
+        game.moves.release()
+
+        return table
+
+    def close(self) -> None:
+        """Releases the index view and unmaps the file."""
+        self.__index.release()
+        self.__view.release()
+        self.__map.close()
+
+
+def import_pgn(pgn_path: str, archive_path: str, append: bool = False) -> tuple:
+    """
+        Converts a PGN file into a game archive, streaming it one game at a
+        time. Games with illegal moves are skipped.
+
+        params:
+            pgn_path: The PGN file path.
+            archive_path: The archive file path.
+            append: If it's True the games are added to an existing archive.
+
+        return: A tuple with the imported and the skipped games counts.
+    """
+    imported = skipped = 0
+
+    with open(pgn_path) as pgn, ArchiveWriter(archive_path, append) as archive:
+        for game in read_pgn(pgn):
+            if game.error is not None or game.result not in RESULTS:
+                skipped += 1
+                continue
+
+            tags = {name: value for name, value in game.tags.items() if name not in ("FEN", "SetUp", "Result")}
+            archive.add(game.moves, game.result, game.tags.get("FEN"), tags)
+            imported += 1
+
+    return imported, skipped
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Imports a PGN file into a binary game archive")
+    parser.add_argument("pgn", help="PGN file")
+    parser.add_argument("archive", help=f"archive file (usually {EXTENSION})")
+    parser.add_argument("--append", action="store_true", help="add the games to an existing archive")
+    args = parser.parse_args(argv)
+
+    imported, skipped = import_pgn(args.pgn, args.archive, args.append)
+    print(f"{imported} games imported, {skipped} skipped", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
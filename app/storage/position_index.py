@@ -0,0 +1,335 @@
+"""Position index module.
+
+Maps position keys (see app.model.zobrist) to the (game, ply) postings of a
+game archive, for "every game reaching this position" queries.
+
+File layout (little endian):
+
+    header: magic, postings count (uint64), games count (uint64)
+    the result code of each game (uint8, see app.storage.archive.RESULTS),
+    padded to 8 bytes
+    the postings keys (uint64), sorted
+    the postings (game uint32, ply uint16, next move uint16), in the keys
+    order
+
+The keys and postings are read through memory maps: a lookup is a binary
+search over the keys followed by a slice of the postings.
+
+usage: python -m app.storage.position_index build ARCHIVE INDEX
+       python -m app.storage.position_index query INDEX FEN
+       python -m app.storage.position_index check [--block N] [--seeds N]
+"""
+import argparse
+import os
+import struct
+import sys
+import tempfile
+from typing import NamedTuple
+
+import numpy as np
+
+from app.model.chess_table import ChessTable
+from app.model.fen import START_FEN, parse_fen
+from app.model.moves import move_name
+from app.storage.archive import RESULTS, ArchiveReader
+
+
+MAGIC = b"CHESSPI1"
+HEADER = struct.Struct("<8sQQ")
+POSTING = np.dtype([("game", "<u4"), ("ply", "<u2"), ("move", "<u2")])
+RUN_SIZE = 1 << 20 # Postings sorted in memory at once while building
+MERGE_BLOCK = 1 << 16 # Postings read from each run at once while merging
+
+
+class PositionStats(NamedTuple):
+    games: int # Postings of the position (a game repeating it counts again)
+    results: dict # Games count by result
+    moves: dict # Packed move played next: {"count": n, results...}
+
+
+class PositionIndex:
+    def __init__(self, path: str):
+        """
+            Reads a position index through memory maps.
+
+            params:
+                path: The index file path.
+        """
+        with open(path, "rb") as file:
+            magic, count, games = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} isn't a position index.")
+
+        offset = HEADER.size
+        self.__results = np.memmap(path, np.uint8, "r", offset, (games,)) if games else np.zeros(0, np.uint8)
+        offset += games + (-games % 8)
+
+        if count:
+            self.__keys = np.memmap(path, "<u8", "r", offset, (count,))
+            self.__postings = np.memmap(path, POSTING, "r", offset + 8 * count, (count,))
+        else:
+            self.__keys = np.zeros(0, "<u8")
+            self.__postings = np.zeros(0, POSTING)
+
+    def __len__(self) -> int:
+        return len(self.__keys)
+
+    def postings(self, key: int) -> np.ndarray:
+        """
+            Finds the postings of a position.
+
+            params:
+                key: The position key (see ChessTable.position_hash).
+
+            return: A structured numpy ndarray (game, ply, move) view, sorted
+            by game and ply. The move is the one played next (0 after the
+            last move of the game).
+        """
+        key = np.uint64(key)
+        start = np.searchsorted(self.__keys, key, "left")
+        end = np.searchsorted(self.__keys, key, "right")
+
+        return self.__postings[start: end]
+
+    def lookup(self, key: int) -> PositionStats:
+        """
+            Gathers the results and next moves statistics of a position.
+
+            params:
+                key: The position key (see ChessTable.position_hash).
+
+            return: A PositionStats object.
+        """
+        postings = self.postings(key)
+        codes = self.__results[postings["game"]]
+
+        results = dict(zip(RESULTS, np.bincount(codes, minlength=len(RESULTS)).tolist()))
+        moves = dict()
+        for move in np.unique(postings["move"]).tolist():
+            if not move:
+                continue
+
+            counts = np.bincount(codes[postings["move"] == move], minlength=len(RESULTS)).tolist()
+            moves[move] = {"count": sum(counts), **dict(zip(RESULTS, counts))}
+
+        return PositionStats(len(postings), results, moves)
+
+
+def build_index(archive_path: str, index_path: str, run_size: int = RUN_SIZE) -> int:
+    """
+        Builds the position index of a game archive in one streaming pass:
+        sorted runs of postings are spilled to temporary files and merged
+        into the index, so the memory use doesn't grow with the archive.
+
+        params:
+            archive_path: The game archive path (see app.storage.archive).
+            index_path: The index file path.
+            run_size: The number of postings sorted in memory at once.
+
+        return: The number of postings.
+    """
+    directory = tempfile.mkdtemp(prefix="position_index_")
+    runs = list()
+    keys = np.empty(run_size, "<u8")
+    postings = np.empty(run_size, POSTING)
+    filled = 0
+
+    def spill() -> None:
+        order = np.argsort(keys[:filled], kind="stable")
+        path = os.path.join(directory, f"run{len(runs)}")
+        np.save(path + "_keys.npy", keys[:filled][order])
+        np.save(path + "_postings.npy", postings[:filled][order])
+        runs.append(path)
+
+    with ArchiveReader(archive_path) as archive:
+        results = np.zeros(len(archive), np.uint8)
+
+        for number in range(len(archive)):
+            game = archive[number]
+            results[number] = RESULTS.index(game.result)
+            position = parse_fen(game.fen or START_FEN)
+
+            for ply in range(len(game.moves) + 1):
+                move = game.moves[ply] if ply < len(game.moves) else 0
+                keys[filled] = position.key
+                postings[filled] = (number, ply, move)
+                filled += 1
+
+                if filled == run_size:
+                    spill()
+                    filled = 0
+                if move:
+                    position.make_move(move)
+
+            game.moves.release()
+
+    if filled:
+        spill()
+
+    try:
+        run_keys = [np.load(path + "_keys.npy", mmap_mode="r") for path in runs]
+        run_postings = [np.load(path + "_postings.npy", mmap_mode="r") for path in runs]
+        count = sum(len(run) for run in run_keys)
+
+        with open(index_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, count, len(results)))
+            file.write(results.tobytes())
+            file.write(b"\0" * (-len(results) % 8))
+            offset = file.tell()
+            file.truncate(offset + 16 * count)
+
+        if count:
+            out_keys = np.memmap(index_path, "<u8", "r+", offset, (count,))
+            out_postings = np.memmap(index_path, POSTING, "r+", offset + 8 * count, (count,))
+            _merge(run_keys, run_postings, out_keys, out_postings)
+            out_keys.flush()
+            out_postings.flush()
+            del out_keys, out_postings
+
+        del run_keys, run_postings
+    finally:
+        for path in runs:
+            os.remove(path + "_keys.npy")
+            os.remove(path + "_postings.npy")
+        os.rmdir(directory)
+
+    return count
+
+
+def _merge(
+        run_keys: list,
+        run_postings: list,
+        out_keys: np.ndarray,
+        out_postings: np.ndarray,
+        block: int = MERGE_BLOCK
+    ) -> None:
+    """
+        K-way merges sorted runs, a block of each run at a time. Runs are
+        spilled in game order and stably sorted, so equal keys are written
+        run by run to keep the postings of a key in game order.
+    """
+    cursors = [0] * len(run_keys)
+    written = 0
+
+    while True:
+        active = [i for i, keys in enumerate(run_keys) if cursors[i] < len(keys)]
+        if not active:
+            break
+
+        # Every key below the smallest block end is known to be in the blocks
+        bound = min(run_keys[i][min(cursors[i] + block, len(run_keys[i])) - 1] for i in active)
+        keys = list()
+        postings = list()
+        for i in active:
+            start = cursors[i]
+            end = start + int(np.searchsorted(run_keys[i][start: start + block], bound, "left"))
+            keys.append(run_keys[i][start: end])
+            postings.append(run_postings[i][start: end])
+            cursors[i] = end
+
+        keys = np.concatenate(keys)
+        if len(keys):
+            order = np.argsort(keys, kind="stable")
+            out_keys[written: written + len(keys)] = keys[order]
+            out_postings[written: written + len(keys)] = np.concatenate(postings)[order]
+            written += len(keys)
+            continue
+
+        # Every block starts at the bound: its postings go run by run, however many blocks they span
+        for i in active:
+            end = cursors[i]
+            while end < len(run_keys[i]):
+                start = end
+                block_end = min(start + block, len(run_keys[i]))
+                end = start + int(np.searchsorted(run_keys[i][start: block_end], bound, "right"))
+                out_keys[written: written + end - start] = run_keys[i][start: end]
+                out_postings[written: written + end - start] = run_postings[i][start: end]
+                written += end - start
+                if end < block_end:
+                    break
+            cursors[i] = end
+
+
+def check_merge(block: int = 4, runs: int = 5, seed: int = 0) -> bool:
+    """
+        Checks the runs merge against a stable sort of every posting, with
+        blocks small enough to split the keys shared by many games.
+
+        params:
+            block: The postings read from each run at once.
+            runs: The number of random runs (a fixed case of a key spanning
+            several blocks is checked too).
+            seed: The random generator seed.
+
+        return: True if every merge kept the keys sorted and the postings of
+        each key in game order.
+    """
+    rng = np.random.default_rng(seed)
+    cases = [[np.ones(6, dtype=np.uint64), np.ones(2, dtype=np.uint64)]] # The start position of many games
+    cases.append([np.sort(rng.integers(0, 8, rng.integers(0, 40)).astype(np.uint64)) for _ in range(runs)])
+
+    for case in cases:
+        run_postings = list()
+        game = 0
+        for keys in case: # Each run holds the next games, one posting per game, stably sorted
+            postings = np.zeros(len(keys), dtype=POSTING)
+            postings["game"] = np.arange(game, game + len(keys))
+            run_postings.append(postings)
+            game += len(keys)
+
+        count = sum(len(keys) for keys in case)
+        out_keys = np.zeros(count, dtype=np.uint64)
+        out_postings = np.zeros(count, dtype=POSTING)
+        _merge(case, run_postings, out_keys, out_postings, block)
+
+        all_keys = np.concatenate(case)
+        order = np.argsort(all_keys, kind="stable")
+        if not (
+            np.array_equal(out_keys, all_keys[order])
+            and np.array_equal(out_postings["game"], np.concatenate(run_postings)["game"][order])
+        ):
+            return False
+
+    return True
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Builds or queries a position index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="index the positions of a game archive")
+    build.add_argument("archive", help="game archive file")
+    build.add_argument("index", help="index file")
+
+    query = commands.add_parser("query", help="show the statistics of a position")
+    query.add_argument("index", help="index file")
+    query.add_argument("fen", help="position FEN string")
+
+    check = commands.add_parser("check", help="check the runs merge with small blocks")
+    check.add_argument("--block", type=int, default=4, help="postings read from each run at once")
+    check.add_argument("--seeds", type=int, default=100, help="random cases checked")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        failed = [seed for seed in range(args.seeds) if not check_merge(args.block, seed=seed)]
+        print(f"{args.seeds - len(failed)} of {args.seeds} merges ok" + (f", seeds {failed} failed" if failed else ""))
+        return 1 if failed else 0
+
+    if args.command == "build":
+        print(f"{build_index(args.archive, args.index)} postings indexed", file=sys.stderr)
+        return 0
+
+    table = ChessTable()
+    table.load_fen(args.fen)
+    stats = PositionIndex(args.index).lookup(table.position_hash())
+
+    print(f"{stats.games} games  " + "  ".join(f"{result} {count}" for result, count in stats.results.items()))
+    for move, counts in sorted(stats.moves.items(), key=lambda item: -item[1]["count"]):
+        print(f"{move_name(move):<6} {counts['count']:>8}  " + "  ".join(f"{r} {counts[r]}" for r in RESULTS))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
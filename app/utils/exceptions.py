@@ -20,3 +20,18 @@ class NoPieceAtLocationException(Exception):
 class UnderXequeException(Exception):
     def __init__(self, *args):
         super().__init__(*args)
+
+
+class InvalidFenException(Exception):
+    def __init__(self, *args):
+        super().__init__(*args)
+
+
+class InvalidSanException(Exception):
+    def __init__(self, *args):
+        super().__init__(*args)
+
+
+class InvalidPgnException(Exception):
+    def __init__(self, *args):
+        super().__init__(*args)
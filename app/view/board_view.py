@@ -1,133 +1,250 @@
 """This module generates the board view image
 """
-import cv2
 import numpy as np
 
-from app.view.sprites import SPRITE_DIM, load_sprite
+from app.view.geometry import GEOMETRY, BoardGeometry
+from app.view.sprites import get_atlas
+from app.model.bitboard import square
 from app.model.pieces.piece import Piece
-from app.model.pieces.king import King
-from app.model.pieces.pawn import Pawn
 from app.model.chess_table import ChessTable
+from app.model.moves import destination, origin
 
 
-SQUARE_PADDING = 1
-SQUARE_DIVISOR = 0
-SQUARE_SELECTION_THICKNESS = 1
-
-TABLE_SIZE = [(SPRITE_DIM[i] + 2 * SQUARE_PADDING) * 8 + SQUARE_DIVISOR * 7 for i in range(2)]
-
 ODD_SQUARE_COLOR = (62, 137, 72)
 EVEN_SQUARE_COLOR = (99, 199, 77)
 SQUARE_DIVISOR_COLOR = (51, 115, 60)
 SELECTED_COLOR = (49, 252, 255)
 POSSIBLE_MOVE_COLOR = (45, 173, 255)
 WARNING_COLOR = (0, 50, 255)
+HINT_COLOR = (255, 160, 40)
+
+# BoardRenderer square states: the piece code (player * 6 + kind) and highlight bits
+EMPTY_SQUARE = 12
+PIECE_MASK = 15
+SELECTED_HIGHLIGHT = 16
+POSSIBLE_MOVE_HIGHLIGHT = 32
+WARNING_HIGHLIGHT = 64
+HINT_HIGHLIGHT = 128
+
+# Painted in the draw_moves then draw_warning order, the last one shows (hints under everything)
+HIGHLIGHTS = (
+    (HINT_HIGHLIGHT, HINT_COLOR),
+    (SELECTED_HIGHLIGHT, SELECTED_COLOR),
+    (POSSIBLE_MOVE_HIGHLIGHT, POSSIBLE_MOVE_COLOR),
+    (WARNING_HIGHLIGHT, WARNING_COLOR)
+)
+
 
-TABLE_BASE = np.ones(TABLE_SIZE + [3], dtype=np.uint8)
-TABLE_BASE[:, :] = SQUARE_DIVISOR_COLOR
+def draw_base(geometry: BoardGeometry) -> np.ndarray:
+    """Draws the empty board of a geometry."""
+    base = np.empty(geometry.size + (3,), dtype=np.uint8)
+    base[:, :] = SQUARE_DIVISOR_COLOR
 
-for i in range(8):
-    for j in range(8):
-        if (i + j) % 2 == 0:
-            color = EVEN_SQUARE_COLOR
-        else:
-            color = ODD_SQUARE_COLOR
+    for sq, (top, left, bottom, right) in enumerate(geometry.rects):
+        base[top: bottom, left: right] = EVEN_SQUARE_COLOR if (sq // 8 + sq % 8) % 2 == 0 else ODD_SQUARE_COLOR
 
-        init = [(SPRITE_DIM[d] + 2 * SQUARE_PADDING + SQUARE_DIVISOR) * k for d, k in enumerate((i, j))]
-        end = [(SPRITE_DIM[d] + 2 * SQUARE_PADDING) * (k + 1) + SQUARE_DIVISOR * k for d, k in enumerate((i, j))]
+    return base
 
-        TABLE_BASE[init[0]: end[0], init[1]: end[1]] = color
+
+TABLE_BASE = draw_base(GEOMETRY)
 
 
 def draw_piece(piece: Piece, board:np.ndarray, turned: bool = False) -> np.ndarray:
-    sprite = load_sprite(type(piece), piece.get_player())
-    turned = turned if piece.get_player() == 0 else not turned
     board = board.copy()
 
-    base_point = [(SPRITE_DIM[d] + 2 * SQUARE_PADDING + SQUARE_DIVISOR) * k + SQUARE_DIVISOR for d, k in enumerate(piece.get_coordinates(turned))]
-
-    board[base_point[0]: base_point[0] + sprite.shape[0], base_point[1]: base_point[1] + sprite.shape[1]][sprite[:, :] != (0, 0, 0)] = sprite[sprite[:, :] != (0, 0, 0)]
+    row, column = piece.get_coordinates(turned)
+    _paste_sprite(board, piece.KIND, piece.get_player(), row * 8 + column)
 
     return board
 
 
 def draw_board(table: ChessTable, turned: bool = False) -> np.ndarray:
     pieces = table.get_table()
-    board = None
+    board = TABLE_BASE.copy()
+    flip = 63 if turned else 0
 
     for i in range(2):
         for piece in pieces[i]:
-            if not piece.isalive():
-                continue
-
-            if board is None:
-                board = draw_piece(piece, TABLE_BASE, turned)
-            else:
-                board = draw_piece(piece, board, turned)
+            if piece.isalive():
+                _paste_sprite(board, piece.KIND, i, piece.get_square() ^ flip)
 
     return board
 
 
-def draw_moves(table: ChessTable, board: np.ndarray, piece: Piece, turned: bool = False) -> np.ndarray:
-    if isinstance(piece, Piece):
-        friends_n_enemies = table.get_friends_n_enemies(piece.get_player())
+class BoardRenderer:
+    def __init__(self, scale: int = 1):
+        """
+            Keeps a frame buffer between frames and only repaints the squares
+            whose piece or highlight changed since the last render.
+
+            params:
+                scale: The board scale (see BoardGeometry).
+        """
+        self.geometry = GEOMETRY if scale == 1 else BoardGeometry(scale)
+        self.__base = TABLE_BASE if scale == 1 else draw_base(self.geometry)
+        self.__frame = self.__base.copy()
+        self.__sprites = dict() # Scaled (sprite, mask) of each piece code
+        self.__painted = [EMPTY_SQUARE] * 64 # Painted state of each view square
+        self.__moves_key = None
+        self.__moves = set()
+
+    def get_frame(self) -> np.ndarray:
+        """Returns the frame buffer (the next render changes it, copy it to keep it)."""
+        return self.__frame
+
+    def get_square(self, loc, turned: bool = False) -> tuple:
+        """
+            Finds the board square under a frame pixel.
+
+            params:
+                loc: The pixel (row, column).
+                turned: If the board is drawn in the second player's point of
+                view.
+
+            return: The board (row, column) coordinates or None if the pixel is
+            out of the squares.
+        """
+        return _to_board(self.geometry.square_at(loc[0], loc[1]), turned)
+
+    def render(
+            self,
+            table: ChessTable,
+            selected = None,
+            warning: int = None,
+            turned: bool = False,
+            hint: int = None
+        ) -> list:
+        """
+            Brings the frame buffer up to date.
+
+            params:
+                table: The ChessTable object.
+                selected: The selected Piece object (its legal moves are
+                highlighted too) or board coordinates tuple (None for no
+                selection).
+                warning: The player whose king is highlighted (None for no
+                highlight).
+                turned: If it's True the board is drawn in the second player's
+                point of view.
+                hint: A packed move whose squares are highlighted, like the
+                engine best move (None for no hint).
+
+            return: A list with the repainted view squares (empty if the frame
+            didn't change).
+        """
+        flip = 63 if turned else 0
+        state = [EMPTY_SQUARE] * 64
+
+        pieces = table.get_table()
+        for i in range(2):
+            for piece in pieces[i]:
+                if piece.isalive():
+                    state[piece.get_square() ^ flip] = i * 6 + piece.KIND
+
+        if hint:
+            state[origin(hint) ^ flip] |= HINT_HIGHLIGHT
+            state[destination(hint) ^ flip] |= HINT_HIGHLIGHT
+
+        if isinstance(selected, Piece):
+            state[selected.get_square() ^ flip] |= SELECTED_HIGHLIGHT
+            for sq in self.__legal_destinations(table, selected):
+                state[sq ^ flip] |= POSSIBLE_MOVE_HIGHLIGHT
+        elif selected is not None:
+            state[square(selected) ^ flip] |= SELECTED_HIGHLIGHT
+
+        if warning is not None:
+            state[table.get_position().king_square(warning) ^ flip] |= WARNING_HIGHLIGHT
+
+        repainted = [sq for sq in range(64) if state[sq] != self.__painted[sq]]
+        if not repainted:
+            return repainted
+
+        for sq in repainted:
+            top, left, bottom, right = self.geometry.rects[sq]
+            self.__frame[top: bottom, left: right] = self.__base[top: bottom, left: right]
+
+            code = state[sq] & PIECE_MASK
+            if code != EMPTY_SQUARE:
+                sprite, mask = self.__sprite(code)
+                y, x = self.geometry.sprite_origins[sq]
+                self.__frame[y: y + sprite.shape[0], x: x + sprite.shape[1]][mask] = sprite[mask]
+
+            self.__painted[sq] = state[sq]
+
+        for highlight, color in HIGHLIGHTS:
+            squares = [sq for sq in repainted if state[sq] & highlight]
+            if squares:
+                self.geometry.draw_outlines(self.__frame, squares, color)
+
+        return repainted
+
+    def invalidate(self) -> None:
+        """Makes the next render repaint every square."""
+        self.__painted = [None] * 64
+
+    def __sprite(self, code: int) -> tuple:
+        if code not in self.__sprites:
+            sprite, mask = get_atlas().get(code % 6, code // 6)
+            scale = self.geometry.scale
+            if scale != 1:
+                sprite = sprite.repeat(scale, axis=0).repeat(scale, axis=1)
+                mask = mask.repeat(scale, axis=0).repeat(scale, axis=1)
+            self.__sprites[code] = (sprite, mask)
+
+        return self.__sprites[code]
+
+    def __legal_destinations(self, table: ChessTable, piece: Piece) -> set:
+        key = (piece.get_square(), table.position_hash())
+        if key != self.__moves_key:
+            self.__moves = {
+                destination(move) for move in table.legal_moves(piece.get_player())
+                if origin(move) == piece.get_square()
+            }
+            self.__moves_key = key
+
+        return self.__moves
+
+
+def _paste_sprite(board: np.ndarray, kind: int, player: int, sq: int) -> None:
+    """Pastes a piece sprite over a view square of a 1 scale board, in place."""
+    sprite, mask = get_atlas().get(kind, player)
+    y, x = GEOMETRY.sprite_origins[sq]
+
+    board[y: y + sprite.shape[0], x: x + sprite.shape[1]][mask] = sprite[mask]
+
 
-        if isinstance(piece, King):
-            moves = piece.possible_moveset(friends_n_enemies, table.get_towers(piece.get_player()))
-        elif isinstance(piece, Pawn):
-            moves = piece.possible_moveset(friends_n_enemies, table.get_last_move())
-        else:
-            moves = piece.possible_moveset(friends_n_enemies)
+def draw_moves(table: ChessTable, board: np.ndarray, piece: Piece, turned: bool = False) -> np.ndarray:
+    flip = 63 if turned else 0
 
-        turned = turned if piece.get_player() == 0 else not turned
-        piece_coordinates = piece.get_coordinates(turned)
+    if isinstance(piece, Piece):
+        moves = table.get_legal_moveset(piece)
+        piece_coordinates = piece.get_coordinates()
     elif isinstance(piece, tuple):
+        moves = list()
         piece_coordinates = piece
     else:
         return
 
-    init = [(SPRITE_DIM[d] + 2 * SQUARE_PADDING + SQUARE_DIVISOR) * k for d, k in enumerate(piece_coordinates)]
-    end = [(SPRITE_DIM[d] + 2 * SQUARE_PADDING) * (k + 1) + SQUARE_DIVISOR * k for d, k in enumerate(piece_coordinates)]
-
-    board[init[0]: end[0], init[1]: init[1] + SQUARE_SELECTION_THICKNESS] = SELECTED_COLOR
-    board[init[0]: end[0], end[1] - SQUARE_SELECTION_THICKNESS: end[1]] = SELECTED_COLOR
-    board[init[0]: init[0] + SQUARE_SELECTION_THICKNESS, init[1]: end[1]] = SELECTED_COLOR
-    board[end[0] - SQUARE_SELECTION_THICKNESS: end[0], init[1]: end[1]] = SELECTED_COLOR
+    GEOMETRY.draw_outlines(board, [square(piece_coordinates) ^ flip], SELECTED_COLOR)
 
-    if isinstance(piece, tuple):
-        return board
+    if moves:
+        GEOMETRY.draw_outlines(board, [square(move) ^ flip for move in moves], POSSIBLE_MOVE_COLOR)
 
-    if len(moves) > 0:
-        moves = np.array([7, 7], dtype=int) - moves if turned else moves
-    for move in moves:
-        init = [(SPRITE_DIM[d] + 2 * SQUARE_PADDING + SQUARE_DIVISOR) * k for d, k in enumerate(move)]
-        end = [(SPRITE_DIM[d] + 2 * SQUARE_PADDING) * (k + 1) + SQUARE_DIVISOR * k for d, k in enumerate(move)]
-
-        board[init[0]: end[0], init[1]: init[1] + SQUARE_SELECTION_THICKNESS] = POSSIBLE_MOVE_COLOR
-        board[init[0]: end[0], end[1] - SQUARE_SELECTION_THICKNESS: end[1]] = POSSIBLE_MOVE_COLOR
-        board[init[0]: init[0] + SQUARE_SELECTION_THICKNESS, init[1]: end[1]] = POSSIBLE_MOVE_COLOR
-        board[end[0] - SQUARE_SELECTION_THICKNESS: end[0], init[1]: end[1]] = POSSIBLE_MOVE_COLOR
-    
     return board
 
 
-def get_square(loc) -> tuple:
-    for i in range(8):
-        for j in range(8):
-            init = [(SPRITE_DIM[d] + 2 * SQUARE_PADDING + SQUARE_DIVISOR) * k for d, k in enumerate((i, j))]
-            end = [(SPRITE_DIM[d] + 2 * SQUARE_PADDING) * (k + 1) + SQUARE_DIVISOR * k for d, k in enumerate((i, j))]
+def get_square(loc, turned: bool = False) -> tuple:
+    return _to_board(GEOMETRY.square_at(loc[0], loc[1]), turned)
+
+def draw_warning(table: ChessTable, board: np.ndarray, player: int, turned: bool = False) -> np.ndarray:
+    GEOMETRY.draw_outlines(board, [square(table.get_king_loc(player)) ^ (63 if turned else 0)], WARNING_COLOR)
 
-            if loc[0] >= init[0] and loc[1] >= init[1] and loc[0] <= end[0] and loc[1] <= end[1]:
-                return i, j
+    return board
 
-def draw_warning(table: ChessTable, board: np.ndarray, player: int) -> np.ndarray:
-    piece_coordinates = table.get_king_loc(player)
-    init = [(SPRITE_DIM[d] + 2 * SQUARE_PADDING + SQUARE_DIVISOR) * k for d, k in enumerate(piece_coordinates)]
-    end = [(SPRITE_DIM[d] + 2 * SQUARE_PADDING) * (k + 1) + SQUARE_DIVISOR * k for d, k in enumerate(piece_coordinates)]
 
-    board[init[0]: end[0], init[1]: init[1] + SQUARE_SELECTION_THICKNESS] = WARNING_COLOR
-    board[init[0]: end[0], end[1] - SQUARE_SELECTION_THICKNESS: end[1]] = WARNING_COLOR
-    board[init[0]: init[0] + SQUARE_SELECTION_THICKNESS, init[1]: end[1]] = WARNING_COLOR
-    board[end[0] - SQUARE_SELECTION_THICKNESS: end[0], init[1]: end[1]] = WARNING_COLOR
+def _to_board(view_coordinates: tuple, turned: bool) -> tuple:
+    """Converts view coordinates to board ones (None stays None)."""
+    if view_coordinates is None or not turned:
+        return view_coordinates
 
-    return board
+    return 7 - view_coordinates[0], 7 - view_coordinates[1]
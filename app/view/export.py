@@ -0,0 +1,265 @@
+"""Headless game rendering module.
+
+Renders every position of a game without a window, through the sprite atlas
+and the incremental BoardRenderer, and writes the frames to a video file
+(.mp4 or .avi, through cv2.VideoWriter) or to a directory of PNG images.
+Game collections are exported in parallel, one output per game.
+
+usage: python -m app.view.export SOURCE DIRECTORY [--format mp4|avi|png] [--scale N] [--fps F] [--turned] [--workers N] [--chunk-size N]
+"""
+import argparse
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import cv2
+import numpy as np
+
+from app.analysis import CHUNK_SIZE, WORKERS
+from app.analysis.runner import parse_move, read_games
+from app.model.bitboard import coordinates
+from app.model.chess_table import ChessTable
+from app.view.board_view import BoardRenderer
+
+
+FOURCC = {".mp4": "mp4v", ".avi": "MJPG"} # Video codec of each video extension
+FPS = 2.0 # Plies per second of the videos
+SCALE = 4 # Board scale of the frames
+
+
+def render_game(moves: list, fen: str = None, turned: bool = False, scale: int = 1):
+    """
+        Renders a game position by position.
+
+        params:
+            moves: The game moves (packed moves or their names in coordinate
+            notation or SAN).
+            fen: The starting position (None for the standard one).
+            turned: If it's True the board is drawn in the second player's
+            point of view.
+            scale: The board scale (see app.view.geometry).
+
+        return: A generator of frames (numpy ndarrays), the starting position
+        first and then one for each move. The frames are the renderer buffer,
+        changed by the next frame: copy them to keep them. An illegal
+        move raises its exception after the frames of the moves before it.
+    """
+    table = ChessTable()
+    if fen is not None:
+        table.load_fen(fen)
+
+    renderer = BoardRenderer(scale)
+    position = table.get_position()
+
+    for move in [None] + list(moves):
+        if move is not None:
+            player = position.turn
+            if isinstance(move, str):
+                _from, to, promotion = parse_move(table, move)
+                table.move(coordinates(_from), coordinates(to), player, promotion)
+            else:
+                table.play_move(move)
+
+        player = position.turn
+        renderer.render(table, None, player if table.is_under_xeque(player) else None, turned)
+
+        yield renderer.get_frame()
+
+
+class FrameWriter:
+    def __init__(self, output: str, fps: float = FPS):
+        """
+            Writes frames into a video file or a PNG sequence.
+
+            params:
+                output: A .mp4 or .avi file path for a video, any other path
+                for a directory of PNG images (0000.png, 0001.png, ...).
+                fps: Frames per second of the video.
+        """
+        self.__output = output
+        self.__fps = fps
+        self.__fourcc = FOURCC.get(os.path.splitext(output)[1].lower())
+        self.__writer = None
+        self.count = 0
+
+        if self.__fourcc is None:
+            os.makedirs(output, exist_ok=True)
+
+    def write(self, frame: np.ndarray) -> None:
+        """Writes the next frame (every frame must have the same size)."""
+        if self.__fourcc is None:
+            cv2.imwrite(os.path.join(self.__output, f"{self.count:04d}.png"), frame)
+        else:
+            if self.__writer is None: # The video size is the first frame one
+                size = (frame.shape[1], frame.shape[0])
+                self.__writer = cv2.VideoWriter(self.__output, cv2.VideoWriter_fourcc(*self.__fourcc), self.__fps, size)
+                if not self.__writer.isOpened():
+                    raise IOError(f"Couldn't open a video writer for {self.__output}.")
+            self.__writer.write(frame)
+
+        self.count += 1
+
+    def close(self) -> None:
+        """Finishes the video file."""
+        if self.__writer is not None:
+            self.__writer.release()
+            self.__writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def export_game(
+        moves: list,
+        output: str,
+        fen: str = None,
+        turned: bool = False,
+        scale: int = SCALE,
+        fps: float = FPS
+    ) -> int:
+    """
+        Renders a game into a video file or a PNG sequence.
+
+        params:
+            moves: The game moves (see render_game).
+            output: A .mp4 or .avi file path for a video, any other path for a
+            directory of PNG images.
+            fen: The starting position (None for the standard one).
+            turned: If it's True the board is drawn in the second player's
+            point of view.
+            scale: The board scale (see app.view.geometry).
+            fps: Frames per second of the video.
+
+        return: The number of written frames. An illegal move raises its
+        exception once the frames before it are written.
+    """
+    with FrameWriter(output, fps) as writer:
+        for frame in render_game(moves, fen, turned, scale):
+            writer.write(frame)
+
+    return writer.count
+
+
+def export_chunk(
+        games: list,
+        directory: str,
+        extension: str = ".mp4",
+        turned: bool = False,
+        scale: int = SCALE,
+        fps: float = FPS
+    ) -> list:
+    """
+        Exports a chunk of games (the work unit of a worker process).
+
+        params:
+            games: A list of (game id, moves line, starting FEN) tuples.
+            directory: The output directory.
+            extension: '.mp4' or '.avi' for videos, '' for PNG sequences.
+            turned, scale, fps: See export_game.
+
+        return: A list of (game id, output path, written frames, error)
+        tuples, the error being None if every move was legal.
+    """
+    results = list()
+
+    for game_id, line, fen in games:
+        path = os.path.join(directory, re.sub(r"[^\w.-]", "_", game_id) + extension)
+        error = None
+
+        with FrameWriter(path, fps) as writer:
+            try:
+                for frame in render_game(line.split(), fen, turned, scale):
+                    writer.write(frame)
+            except Exception as e:
+                error = str(e)
+
+        results.append((game_id, path, writer.count, error))
+
+    return results
+
+
+def export_games(
+        games,
+        directory: str,
+        extension: str = ".mp4",
+        workers: int = WORKERS,
+        chunk_size: int = CHUNK_SIZE,
+        turned: bool = False,
+        scale: int = SCALE,
+        fps: float = FPS
+    ):
+    """
+        Exports a stream of games in parallel, each one into its own video
+        file or PNG sequence. Only a few chunks per worker are in flight at
+        once.
+
+        params:
+            games: An iterable of (game id, moves line, starting FEN) tuples.
+            directory: The output directory.
+            extension: '.mp4' or '.avi' for videos, '' for PNG sequences.
+            workers: The number of worker processes (None for one per CPU,
+            1 to run in this process).
+            chunk_size: The number of games sent to a worker at once.
+            turned, scale, fps: See export_game.
+
+        return: A generator of the export_chunk results, in the input order.
+    """
+    os.makedirs(directory, exist_ok=True)
+    games = iter(games)
+    chunks = iter(lambda: list(islice(games, chunk_size)), [])
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from export_chunk(chunk, directory, extension, turned, scale, fps)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window = 2 * (workers or os.cpu_count() or 1)
+        pending = deque()
+
+        for chunk in chunks:
+            pending.append(executor.submit(export_chunk, chunk, directory, extension, turned, scale, fps))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="games file, directory of .txt, .pgn and .cga files or - for the standard input")
+    parser.add_argument("directory", help="output directory")
+    parser.add_argument("--format", choices=("mp4", "avi", "png"), default="mp4", help="video format or PNG sequences")
+    parser.add_argument("--scale", type=int, default=SCALE, help="board scale of the frames")
+    parser.add_argument("--fps", type=float, default=FPS, help="plies per second of the videos")
+    parser.add_argument("--turned", action="store_true", help="draw the board in the second player's point of view")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="worker processes (defaults to one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="games sent to a worker at once")
+    args = parser.parse_args(argv)
+
+    extension = "" if args.format == "png" else "." + args.format
+    games = errors = 0
+
+    for game_id, path, frames, error in export_games(
+            read_games(args.source), args.directory, extension, args.workers, args.chunk_size,
+            args.turned, args.scale, args.fps
+        ):
+        games += 1
+        if error is not None:
+            errors += 1
+            print(f"{game_id}: {error} ({frames} frames written to {path})", file=sys.stderr)
+
+    print(f"{games} games exported, {errors} with errors", file=sys.stderr)
+
+    return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
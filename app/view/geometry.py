@@ -0,0 +1,88 @@
+"""Board geometry module
+
+Pixel rectangles of the squares, pixel to square lookup tables and the
+pixels of the square highlights, computed once per board scale.
+"""
+import numpy as np
+
+from app.view.sprites import SPRITE_DIM
+
+
+SQUARE_PADDING = 1
+SQUARE_DIVISOR = 0
+SQUARE_SELECTION_THICKNESS = 1
+
+TABLE_SIZE = [(SPRITE_DIM[i] + 2 * SQUARE_PADDING) * 8 + SQUARE_DIVISOR * 7 for i in range(2)]
+
+
+class BoardGeometry:
+    def __init__(self, scale: int = 1):
+        """
+            Computes the board layout at a scale.
+
+            params:
+                scale: Pixels per board pixel at the 1 scale (sprites, paddings,
+                divisors and highlights are all scaled by it).
+        """
+        self.scale = scale
+        step = [(SPRITE_DIM[d] + 2 * SQUARE_PADDING + SQUARE_DIVISOR) * scale for d in range(2)]
+        side = [(SPRITE_DIM[d] + 2 * SQUARE_PADDING) * scale for d in range(2)]
+        self.size = tuple(TABLE_SIZE[d] * scale for d in range(2))
+
+        rows, columns = np.divmod(np.arange(64), 8)
+        top = rows * step[0]
+        left = columns * step[1]
+
+        # Each square's first pixel and the pixel past its end, view square order (row * 8 + column)
+        self.rects = np.stack([top, left, top + side[0], left + side[1]], axis=1)
+        self.sprite_origins = np.stack([top, left], axis=1) + SQUARE_DIVISOR * scale
+
+        # The row (column) of each pixel line, -1 over the divisors
+        self.__rows = np.full(self.size[0], -1, dtype=np.int8)
+        self.__columns = np.full(self.size[1], -1, dtype=np.int8)
+        for i in range(8):
+            self.__rows[i * step[0]: i * step[0] + side[0]] = i
+            self.__columns[i * step[1]: i * step[1] + side[1]] = i
+
+        # Flat pixel indices of each square's highlight outline
+        thickness = SQUARE_SELECTION_THICKNESS * scale
+        ring = np.zeros(side, dtype=bool)
+        ring[:thickness] = ring[-thickness:] = True
+        ring[:, :thickness] = ring[:, -thickness:] = True
+        ring_rows, ring_columns = np.nonzero(ring)
+        self.outlines = (top[:, None] + ring_rows) * self.size[1] + left[:, None] + ring_columns
+
+    def square_at(self, y: int, x: int) -> tuple:
+        """
+            Finds the square under a pixel.
+
+            params:
+                y: The pixel row.
+                x: The pixel column.
+
+            return: A (row, column) tuple in view coordinates or None if the
+            pixel is out of the squares.
+        """
+        if not (0 <= y < self.size[0] and 0 <= x < self.size[1]):
+            return None
+
+        row = int(self.__rows[y])
+        column = int(self.__columns[x])
+        if row < 0 or column < 0:
+            return None
+
+        return row, column
+
+    def draw_outlines(self, board: np.ndarray, squares, color: tuple) -> None:
+        """
+            Draws the highlight outline of several squares at once, in place.
+
+            params:
+                board: A contiguous (height, width, 3) board image at this scale.
+                squares: The view squares (row * 8 + column).
+                color: The outline color.
+        """
+        board.reshape(-1, 3)[self.outlines[squares].ravel()] = color
+
+
+GEOMETRY = BoardGeometry() # The 1 scale layout
@@ -3,6 +3,7 @@
 import os
 
 import cv2
+import numpy as np
 from numpy import ndarray
 
 from app.model.pieces import *
@@ -20,10 +21,76 @@ pieces_names = {
 
 SPRITE_DIM = (16, 16)
 SPRITES_PATH = "app/view/sprites/color/"
+SPRITES_LAZY = False # Load each sprite on its first use instead of all at once
+
+
+class SpriteAtlas:
+    def __init__(self, path: str = SPRITES_PATH, lazy: bool = SPRITES_LAZY):
+        """
+            Holds every piece sprite in a single (player, kind) indexed array,
+            next to the mask of its non black pixels. Each sprite is read from
+            disk only once.
+
+            params:
+                path: The sprites directory, with white and black folders.
+                lazy: If it's True each sprite is loaded on its first use,
+                otherwise all of them are loaded now.
+        """
+        self.__path = path
+        self.sprites = np.zeros((2, 6, *SPRITE_DIM, 3), dtype=np.uint8)
+        self.masks = np.zeros((2, 6, *SPRITE_DIM), dtype=bool)
+        self.__loaded = [[False] * 6 for _ in range(2)]
+
+        if not lazy:
+            for player in range(2):
+                for piece_type in pieces_names:
+                    self.__load(piece_type.KIND, player)
+
+    def get(self, kind: int, player: int) -> tuple:
+        """
+            Returns a sprite and its mask (views over the atlas, don't change them).
+
+            params:
+                kind: The piece kind (see app.model.bitboard).
+                player: The player num (0 or 1).
+
+            returns: A tuple with the (height, width, 3) sprite and the
+            (height, width) boolean mask.
+        """
+        if not self.__loaded[player][kind]:
+            self.__load(kind, player)
+
+        return self.sprites[player, kind], self.masks[player, kind]
+
+    def __load(self, kind: int, player: int) -> None:
+        piece_type = next(piece_type for piece_type in pieces_names if piece_type.KIND == kind)
+        color = ["white", "black"][player]
+        path = os.path.join(self.__path, color, pieces_names[piece_type])
+
+        sprite = cv2.imread(path)
+        sprite = cv2.cvtColor(sprite, cv2.COLOR_BGR2RGB)
+
+        self.sprites[player, kind] = sprite
+        self.masks[player, kind] = sprite.any(axis=2)
+        self.__loaded[player][kind] = True
+
+
+_atlas = None
+
+
+def get_atlas() -> SpriteAtlas:
+    """Returns the shared sprite atlas, creating it on the first call."""
+    global _atlas
+
+    if _atlas is None:
+        _atlas = SpriteAtlas()
+
+    return _atlas
+
 
 def load_sprite(piece_type: Piece, player: int) -> ndarray:
     """
-        Loads a piece sprite.
+        Loads a piece sprite (from the shared atlas).
 
         parameters:
             piece_type: A Piece class to identify the piece type.
@@ -31,11 +98,4 @@ def load_sprite(piece_type: Piece, player: int) -> ndarray:
 
         returns: A numpy ndarray with the piece sprite image.
     """
-    color = ["white", "black"][player]
-    piece_name = pieces_names[piece_type]
-    path = os.path.join(SPRITES_PATH, color, piece_name)
-
-    sprite = cv2.imread(path)
-    sprite = cv2.cvtColor(sprite, cv2.COLOR_BGR2RGB)
-
-    return sprite
+    return get_atlas().get(piece_type.KIND, player)[0]
@@ -0,0 +1,102 @@
+"""Perft benchmark and move generator correctness suite.
+
+Runs the standard perft positions to fixed depths, reports the nodes per
+second of each run and fails when a node count differs from the reference.
+
+usage: python -m benchmarks.perft [--depth N] [--divide] [--position NAME]
+"""
+import argparse
+import sys
+import time
+
+from app.model.chess_table import ChessTable
+from app.model.fen import START_FEN
+
+
+# (name, FEN, reference node counts for depths 1, 2, ...)
+POSITIONS = [
+    ("start", START_FEN, (20, 400, 8902, 197281, 4865609)),
+    (
+        "kiwipete", # Rocks, en passant, pins and promotions
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        (48, 2039, 97862, 4085603)
+    ),
+    (
+        "endgame", # Discovered xeques and en passant pins along the row
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        (14, 191, 2812, 43238, 674624)
+    ),
+    (
+        "promotions", # Underpromotions, captures while in xeque
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        (6, 264, 9467, 422333)
+    ),
+    (
+        "talkchess",
+        "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        (44, 1486, 62379, 2103487)
+    ),
+    (
+        "middlegame",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        (46, 2079, 89890, 3894594)
+    ),
+]
+
+DEFAULT_DEPTH = 3
+
+
+def run(name: str, fen: str, expected: tuple, depth: int, divide: bool = False) -> bool:
+    """
+        Runs perft on one position and prints the result line.
+
+        params:
+            name: The position name.
+            fen: The position FEN string.
+            expected: The reference node counts by depth.
+            depth: The requested depth (capped to the known references).
+            divide: If it's True prints the node count of every root move.
+
+        return: True if the node count matches the reference.
+    """
+    depth = min(depth, len(expected))
+    table = ChessTable()
+    table.load_fen(fen)
+
+    start = time.perf_counter()
+    if divide:
+        moves = table.divide(depth)
+        nodes = sum(moves.values())
+    else:
+        nodes = table.perft(depth)
+    elapsed = time.perf_counter() - start
+
+    if divide:
+        for move, count in sorted(moves.items()):
+            print(f"    {move}: {count}")
+
+    passed = nodes == expected[depth - 1]
+    status = "ok" if passed else f"FAILED (expected {expected[depth - 1]})"
+    nps = nodes / elapsed if elapsed > 0 else float("inf")
+    print(f"{name:<12} depth {depth}  {nodes:>10} nodes  {elapsed:8.3f} s  {nps:>10.0f} nps  {status}")
+
+    return passed
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="perft depth in plies")
+    parser.add_argument("--divide", action="store_true", help="show the node count of each root move")
+    parser.add_argument("--position", choices=[name for name, *_ in POSITIONS], help="run a single position")
+    args = parser.parse_args(argv)
+
+    passed = True
+    for name, fen, expected in POSITIONS:
+        if args.position in (None, name):
+            passed = run(name, fen, expected, args.depth, args.divide) and passed
+
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Engine search benchmark.
+
+Searches a few positions with a fixed nodes budget (so every run visits the
+same tree) and reports the reached depth, best move and nodes per second.
+
+usage: python -m benchmarks.search [--nodes N] [--position NAME]
+"""
+import argparse
+import sys
+
+from app.engine.search import Engine
+from app.model.chess_table import ChessTable
+from app.model.moves import move_name
+from benchmarks.perft import POSITIONS
+
+
+DEFAULT_NODES = 50000
+
+
+def run(name: str, fen: str, nodes: int) -> float:
+    """
+        Searches one position and prints the result line.
+
+        params:
+            name: The position name.
+            fen: The position FEN string.
+            nodes: The nodes budget.
+
+        return: The nodes per second.
+    """
+    table = ChessTable()
+    table.load_fen(fen)
+
+    result = Engine().search(table, node_limit=nodes)
+    pv = " ".join(move_name(move) for move in result.pv)
+    print(
+        f"{name:<12} depth {result.depth:>2}  {result.nodes:>8} nodes  {result.elapsed:7.3f} s  "
+        f"{result.nps:>8.0f} nps  score {result.score:>6}  pv {pv}"
+    )
+
+    return result.nps
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=DEFAULT_NODES, help="nodes budget of each search")
+    parser.add_argument("--position", choices=[name for name, *_ in POSITIONS], help="run a single position")
+    args = parser.parse_args(argv)
+
+    for name, fen, _ in POSITIONS:
+        if args.position in (None, name):
+            run(name, fen, args.nodes)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
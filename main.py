@@ -1,4 +1,28 @@
+import argparse
+
 from app.controller.game import Game
+from app.engine import SEARCH_TIME
+
+
+ENGINE_PLAYERS = {"white": (0,), "black": (1,), "both": (0, 1)}
+
+parser = argparse.ArgumentParser(description="Chess game")
+parser.add_argument("--engine", choices=ENGINE_PLAYERS.keys(), help="side(s) played by the engine")
+parser.add_argument("--think-time", type=float, default=SEARCH_TIME, help="engine seconds per move")
+parser.add_argument("--book", help="opening book file played by the engine")
+parser.add_argument("--tablebases", help="endgame tablebases directory played by the engine")
+parser.add_argument("--scale", type=int, default=1, help="board image scale")
+parser.add_argument("--time", type=float, help="minutes on each player's clock (no clocks by default)")
+parser.add_argument("--increment", type=float, default=0.0, help="seconds added to a clock after each move")
+parser.add_argument("--moves-to-go", type=int, help="moves played before the clock time is added again")
+parser.add_argument("--ponder", action="store_true", help="analyse the human's turns, showing the engine best move")
+args = parser.parse_args()
 
+time_control = None
+if args.time is not None:
+    time_control = (args.time * 60, args.increment, args.moves_to_go)
 
-Game().show()
+Game(
+    ENGINE_PLAYERS.get(args.engine, ()), args.think_time, args.book, args.tablebases, args.scale,
+    time_control, args.ponder
+).show()